@@ -1,19 +1,56 @@
-from aqt import mw
-from aqt.utils import showInfo
-from aqt.qt import *
+import importlib
+import os
+import time
+
+_import_started = time.perf_counter()
+
+from anki import hooks
+from aqt import gui_hooks, mw
+from aqt.qt import QAction, QMenu
+
+from .field_filters import on_field_filter, on_operation_did_execute
+
+# Import time (in seconds) of the add-on itself and of each dialog loaded on demand.
+# Set CLZZ_PROFILE_IMPORT=1 to print them to the console.
+import_timings = {}
+
+_dialog_classes = {}
+
+
+def _record_timing(key, started):
+    import_timings[key] = time.perf_counter() - started
+    if os.environ.get("CLZZ_PROFILE_IMPORT"):
+        print(f"clzz: {key} took {import_timings[key] * 1000:.2f} ms")
+
+
+def _dialog_class(module_name, class_name):
+    """Imports a dialog module on first use and returns the dialog class."""
+    key = f"{module_name}.{class_name}"
+    if key not in _dialog_classes:
+        started = time.perf_counter()
+        module = importlib.import_module(f".{module_name}", __name__)
+        _dialog_classes[key] = getattr(module, class_name)
+        _record_timing(module_name, started)
+    return _dialog_classes[key]
+
+
+def on_js_message(handled, message, context):
+    # O coletor só é carregado quando um card instrumentado envia medições
+    if not message.startswith("clzz:perf:"):
+        return handled
+    from .render_stats import on_js_message
+    return on_js_message(handled, message, context)
 
-from .config_dialog import ConfigDialog
-from .manage_dialog import ManageDialog
 
 def on_clzz_config():
-    dialog = ConfigDialog()
+    dialog = _dialog_class("config_dialog", "ConfigDialog")()
     dialog.exec()
 
 def on_create_clzz_card():
     on_clzz_config()
 
 def on_manage_clzz():
-    dialog = ManageDialog()
+    dialog = _dialog_class("manage_dialog", "ManageDialog")()
     dialog.exec()
 
 action = QAction("Clzz", mw)
@@ -26,3 +63,9 @@ clzz_menu.addAction("Manage Clzz", on_manage_clzz)
 action.setMenu(clzz_menu)
 
 mw.form.menuTools.addAction(action)
+
+gui_hooks.webview_did_receive_js_message.append(on_js_message)
+gui_hooks.operation_did_execute.append(on_operation_did_execute)
+hooks.field_filter.append(on_field_filter)
+
+_record_timing("__init__", _import_started)
@@ -0,0 +1,106 @@
+import hashlib
+import re
+
+SCRIPT_RE = re.compile(r"<script[^>]*>(.*?)</script>", re.DOTALL | re.IGNORECASE)
+QUERY_RE = re.compile(r"querySelectorAll\(\s*(['\"])(.*?)\1\s*\)")
+SET_INTERVAL_RE = re.compile(r"\bsetInterval\s*\(")
+BLUR_RE = re.compile(r"filter\s*[:=]\s*['\"]?blur\(")
+
+# Limites padrão de custo por lado de template; o valor None desativa a verificação
+DEFAULT_BUDGET = {
+    "template_bytes": 16384,
+    "script_blocks": 6,
+    "repeated_queries": 0,
+    "set_interval_sites": 1,
+    "blur_sites": 2,
+    "duplicate_blocks": 0,
+    "css_bytes": 8192,
+}
+
+
+def analyze_fmt(fmt):
+    """Returns the static render cost of one side of a template."""
+    scripts = [body for body in SCRIPT_RE.findall(fmt) if body.strip()]
+
+    queries = {}
+    for _quote, selector in QUERY_RE.findall(fmt):
+        queries[selector] = queries.get(selector, 0) + 1
+
+    blocks = {}
+    for body in scripts:
+        digest = hashlib.sha1(body.strip().encode("utf-8")).hexdigest()
+        blocks[digest] = blocks.get(digest, 0) + 1
+
+    return {
+        "template_bytes": len(fmt.encode("utf-8")),
+        "script_blocks": len(scripts),
+        "repeated_queries": sum(count - 1 for count in queries.values() if count > 1),
+        "queries": queries,
+        "set_interval_sites": len(SET_INTERVAL_RE.findall(fmt)),
+        "blur_sites": len(BLUR_RE.findall(fmt)),
+        "duplicate_blocks": sum(count - 1 for count in blocks.values() if count > 1),
+    }
+
+
+def analyze_model(model, budget=None):
+    """Analyzes every template of a model plus its CSS.
+
+    Returns {"templates": [{"name", "qfmt", "afmt"}], "css_bytes", "css_blur_sites",
+    "warnings"}, with a warning for each metric over the budget.
+    """
+    budget = dict(DEFAULT_BUDGET, **(budget or {}))
+    report = {
+        "templates": [],
+        "css_bytes": len(model['css'].encode("utf-8")),
+        "css_blur_sites": len(BLUR_RE.findall(model['css'])),
+        "warnings": [],
+    }
+
+    for tmpl in model['tmpls']:
+        entry = {"name": tmpl['name'], "qfmt": analyze_fmt(tmpl['qfmt']), "afmt": analyze_fmt(tmpl['afmt'])}
+        report["templates"].append(entry)
+        for side, label in (("qfmt", "Front"), ("afmt", "Back")):
+            for metric, value in entry[side].items():
+                limit = budget.get(metric)
+                if metric != "queries" and limit is not None and value > limit:
+                    report["warnings"].append(f"{tmpl['name']} {label}: {metric} is {value} (budget {limit})")
+
+    if budget.get("css_bytes") is not None and report["css_bytes"] > budget["css_bytes"]:
+        report["warnings"].append(f"CSS: css_bytes is {report['css_bytes']} (budget {budget['css_bytes']})")
+    return report
+
+
+def format_sizes(sizes, budget=None):
+    """Returns the source and minified byte counts of compiled templates, with their budget."""
+    budget = dict(DEFAULT_BUDGET, **(budget or {}))
+    lines = []
+    for key, label, metric in (("qfmt", "Front", "template_bytes"), ("afmt", "Back", "template_bytes"),
+                               ("css", "CSS", "css_bytes"), ("runtime", "Runtime", None)):
+        source, output = sizes[key]
+        line = f"{label}: {source} -> {output} bytes"
+        if metric and budget.get(metric) is not None:
+            line += f" (budget {budget[metric]})" + (" over budget" if output > budget[metric] else "")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def format_report(report):
+    """Returns the report as plain text for the dialogs."""
+    lines = []
+    for entry in report["templates"]:
+        for side, label in (("qfmt", "Front"), ("afmt", "Back")):
+            cost = entry[side]
+            lines.append(
+                f"{entry['name']} {label}: {cost['template_bytes']} bytes, "
+                f"{cost['script_blocks']} <script> blocks, "
+                f"{cost['repeated_queries']} repeated querySelectorAll, "
+                f"{cost['set_interval_sites']} setInterval, "
+                f"{cost['blur_sites']} blur filters, "
+                f"{cost['duplicate_blocks']} duplicated blocks"
+            )
+    lines.append(f"CSS: {report['css_bytes']} bytes, {report['css_blur_sites']} blur filters")
+    if report["warnings"]:
+        lines.append("")
+        lines.append("Over budget:")
+        lines.extend(f"  {warning}" for warning in report["warnings"])
+    return "\n".join(lines)
@@ -0,0 +1,118 @@
+import copy
+
+from .compiler import apply_to_model, compile_templates
+from .model_index import is_clzz_model
+from .runtime import runtime_files, trash_unused_runtimes, write_runtime_asset
+from .settings_store import DEFAULT_SETTINGS
+from .template_patch import is_template_only_change, model_digest, patch_model_vars
+
+# Criação e atualização dos card types Clzz, sem Qt: usadas pelos diálogos e
+# pelo tools/stamp.py
+
+
+def new_card_type(col, settings):
+    """Builds (without saving) a Clzz cloze note type from settings; returns (model, compiled)."""
+    mm = col.models
+    model = mm.new(settings["card_type_name"].strip())
+
+    mm.add_field(model, mm.new_field("Text"))
+    mm.add_field(model, mm.new_field("Extra"))
+
+    # Templates e CSS gerados a partir das opções selecionadas
+    compiled = compile_templates(settings)
+    template = {
+        "name": model["name"],
+        "qfmt": compiled["qfmt"],
+        "afmt": compiled["afmt"],
+    }
+    model["css"] = compiled["css"]
+    model["clzz"] = settings  # Permite regenerar o card type no Manage Clzz
+
+    model["tmpls"] = [template]  # Define os templates
+    model["type"] = 1  # Define como Cloze
+    return model, compiled
+
+
+def add_card_type(col, model, compiled):
+    """Saves a note type built by new_card_type, with its runtime file."""
+    write_runtime_asset(col, compiled)
+    return col.models.add_dict(model)
+
+
+def apply_card_type_changes(model, variables, disable_animations=None):
+    """Applies the Manage dialog changes to a model and returns the compiled output, if any.
+
+    Card types created with their settings stored (model["clzz"]) are regenerated, so
+    feature changes such as disable_animations take effect; older ones only get their
+    palette variables patched. disable_animations=None keeps each model's own value.
+    """
+    stored = model.get('clzz')
+    if not stored:
+        patch_model_vars(model, variables)
+        return None
+
+    settings = dict(DEFAULT_SETTINGS, **stored)
+    if "colors" in variables:
+        settings["deck_colors"] = variables["colors"]
+    if "colorsClz" in variables:
+        settings["cloze_colors"] = variables["colorsClz"]
+    if disable_animations is not None:
+        settings["disable_animations"] = disable_animations
+    return apply_to_model(model, settings)
+
+
+def save_if_changed(col, original, model, compiled):
+    """Saves model if it differs from original; returns True if it was saved.
+
+    Only template and CSS changes are saved: anything that would be a schema change
+    (and force a full sync) raises ValueError. The previous runtime file is moved to
+    the trash once no note type loads it.
+    """
+    if model_digest(model) == model_digest(original):
+        return False
+    if not is_template_only_change(original, model):
+        raise ValueError(f"Saving {model['name']} would change its fields or templates.")
+    if compiled:
+        write_runtime_asset(col, compiled)
+    col.models.update_dict(model)
+    # Runtime da versão anterior, se nenhum outro card type o usa
+    trash_unused_runtimes(col, runtime_files(original) - runtime_files(model))
+    return True
+
+
+def update_card_types(col, mids, variables, disable_animations=None):
+    """Applies the Manage dialog changes to the given note types; returns the ids saved."""
+    saved = []
+    for mid in mids:
+        model = col.models.get(mid)
+        if not model:
+            continue
+        original = copy.deepcopy(model)
+        compiled = apply_card_type_changes(model, variables, disable_animations)
+        if save_if_changed(col, original, model, compiled):
+            saved.append(mid)
+    return saved
+
+
+def stamp_card_type(col, settings):
+    """Creates the note type named in settings, or regenerates it if it already exists.
+
+    Returns "created", "updated" or "unchanged".
+    """
+    name = settings["card_type_name"].strip()
+    if not name:
+        raise ValueError("The settings have no card_type_name.")
+
+    model = col.models.by_name(name)
+    if not model:
+        add_card_type(col, *new_card_type(col, settings))
+        return "created"
+
+    if not is_clzz_model(model):
+        raise ValueError(f"Note type '{name}' is not a Clzz card type.")
+    if not model.get('clzz'):
+        # Sem regiões marcadas não há como regenerar sem duplicar os scripts antigos
+        raise ValueError(f"Note type '{name}' was created by an older Clzz version.")
+    original = copy.deepcopy(model)
+    compiled = apply_to_model(model, settings)
+    return "updated" if save_if_changed(col, original, model, compiled) else "unchanged"
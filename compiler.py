@@ -0,0 +1,448 @@
+import copy
+import hashlib
+import json
+
+from .minify import minify_css, minify_html, minify_js
+from .runtime import (
+    HINTS_JS,
+    HINTS_SETUP_JS,
+    INSTRUMENT_JS,
+    LIFECYCLE_JS,
+    SCHEDULER_JS,
+    TIMERS_JS,
+    bootstrap_js,
+    runtime_asset,
+)
+from .template_patch import region_names, sync_regions, vars_block, wrap_region
+
+BASIC_CSS = """
+            .card {
+    font-family: arial;
+    font-size: 20px;
+    text-align: center;
+    color: black;
+    background-color: white;
+}
+.cloze {
+    font-weight: bold;
+    color: blue;
+}
+.nightMode .cloze {
+    color: lightblue;
+}"""
+
+# Com "Disable Animations" nada de transições ou animações nos elementos coloridos
+STATIC_CSS = """
+.cloze, .deck-name, b, strong {
+    transition: none !important;
+    animation: none !important;
+}
+"""
+
+# Máscaras das clozes escondidas; a dica (tecla H) alterna apenas a classe
+# clzz-masked do <html>. "shadow" e "bars" não usam filter, que obriga cada
+# elemento a ser composto à parte.
+MASK_CSS = {
+    "blur": """
+.clzz-masked .clzz-hidden {
+    filter: blur(7px);
+}
+""",
+    "shadow": """
+.clzz-masked .clzz-hidden {
+    color: transparent !important;
+    text-shadow: 0 0 7px rgba(0, 0, 0, 0.5);
+    transition: none !important;
+}
+.clzz-masked .nightMode .clzz-hidden {
+    text-shadow: 0 0 7px rgba(255, 255, 255, 0.5);
+}
+""",
+    "bars": """
+.clzz-masked .clzz-hidden {
+    color: transparent !important;
+    background-color: #9e9e9e;
+    border-radius: 4px;
+    transition: none !important;
+}
+""",
+}
+
+CACHE_SIZE = 32
+
+_cache = {}
+
+
+class Feature:
+    """A template feature and the fragments it contributes.
+
+    Fragments are strings or functions of the settings dict:
+      head     -- markup at the top of both sides
+      runtime  -- JS installed once per webview (before the card markup)
+      setup    -- JS run on each render, after the card markup
+      cloze    -- JS run for each `element` of the single .cloze pass
+      front/back -- markup of the question/answer side
+      css      -- model CSS
+    Features listed in `requires` are emitted first, and only once.
+    """
+
+    def __init__(self, name, enabled=None, requires=(), head="", runtime="", setup="", cloze="",
+                 front="", back="", css=""):
+        self.name = name
+        self.enabled = enabled or (lambda settings: False)
+        self.requires = requires
+        self.head = head
+        self.runtime = runtime
+        self.setup = setup
+        self.cloze = cloze
+        self.front = front
+        self.back = back
+        self.css = css
+
+    def render(self, slot, settings):
+        fragment = getattr(self, slot)
+        return fragment(settings) if callable(fragment) else fragment
+
+
+def _always(settings):
+    return True
+
+
+def _animated(settings):
+    return not settings.get("disable_animations")
+
+
+def _python_clozes(settings):
+    return settings.get("python_filters") and settings.get("show_blur")
+
+
+def _cloze_style(settings):
+    return settings.get("show_blur") or settings.get("use_cloze_colors") or not settings.get("auto_color_bold")
+
+
+def _cloze_css(settings):
+    color = "#0bba2e"
+    if settings.get("use_cloze_colors") and not _animated(settings) and settings.get("cloze_colors"):
+        color = settings["cloze_colors"][0]
+    # Seletor mais específico que .nightMode .cloze do CSS básico
+    return wrap_region("cloze", f"""
+html .card .cloze {{
+    font-weight: bold;
+    color: {color};
+}}
+""", css=True)
+
+
+def _bold_css(settings):
+    palette = settings.get("deck_colors", [])
+    if not palette:
+        return ""
+    # Uma propriedade por cor; o n-ésimo <b>/<strong> de cada bloco usa a cor n,
+    # voltando ao início da paleta. nth-of-type conta dentro de cada elemento pai e
+    # conta <b> e <strong> em separado: negrito no Extra, em cada <li> ou <p>
+    # recomeça na cor 1. O modo JS (bold_colors) numera o card inteiro, mas só
+    # colore os primeiros len(palette) negritos.
+    count = len(palette)
+    properties = "".join(f"    --clzz-bold-{n}: {color};\n" for n, color in enumerate(palette, 1))
+    rules = "".join(
+        f".card b:nth-of-type({count}n+{n}), .card strong:nth-of-type({count}n+{n}) {{\n"
+        f"    color: var(--clzz-bold-{n}) !important;\n}}\n"
+        for n in range(1, count + 1)
+    )
+    return wrap_region("bold", f"\n.card {{\n{properties}}}\n{rules}", css=True)
+
+
+def _card_markup(settings, back):
+    markup = '<span class="clzz"></span>'
+    if settings.get("show_decks"):
+        # Com python_filters o nome do deck já vem limpo do filtro clzz-deck
+        # (os apps móveis não têm o add-on, por isso é opcional)
+        subdeck = "{{clzz-deck:Subdeck}}" if settings.get("python_filters") else "{{Subdeck}}"
+        markup += f'<div class="deck-name">{subdeck}</div>'
+    # As clozes escondidas também podem vir prontas do filtro clzz
+    markup += "{{clzz:cloze:Text}}" if _python_clozes(settings) else "{{cloze:Text}}"
+    if back:
+        markup += "<br>\n<div id='extra'>{{Extra}}</div>"
+    return markup
+
+
+FEATURES = [
+    Feature("instrument", enabled=lambda s: s.get("instrument"), requires=("lifecycle",), runtime=INSTRUMENT_JS),
+    Feature(
+        "vars",
+        enabled=_always,
+        head=lambda s: wrap_region("vars", vars_block({
+            "colors": s.get("deck_colors", []),
+            "colorsClz": s.get("cloze_colors", []),
+        })),
+    ),
+    Feature("lifecycle", enabled=_always, runtime=LIFECYCLE_JS, setup="clzz.begin();"),
+    Feature("timers", requires=("lifecycle",), runtime=TIMERS_JS),
+    Feature("scheduler", requires=("timers",), runtime=SCHEDULER_JS),
+    Feature("query_clozes", setup="var elements = document.querySelectorAll('.cloze');"),
+    Feature("query_bold", setup='var boldElements = document.querySelectorAll("b, strong");'),
+    Feature(
+        "card",
+        enabled=_always,
+        front=lambda s: _card_markup(s, back=False),
+        back=lambda s: _card_markup(s, back=True),
+    ),
+    Feature("deck_header", setup="var deckNameElement = document.querySelector('.deck-name');"),
+    Feature(
+        "deck_name_cleanup",
+        enabled=lambda s: s.get("show_decks") and not s.get("python_filters"),
+        requires=("deck_header",),
+        setup="deckNameElement.innerText = deckNameElement.innerText.replace(/^\\d+/g, '').trim();",
+    ),
+    Feature(
+        "deck_colors",
+        enabled=lambda s: s.get("show_decks") and s.get("use_deck_colors") and _animated(s),
+        requires=("scheduler", "deck_header"),
+        setup="""deckNameElement.style.color = colors[0];
+clzz.animate(deckNameElement, colors);""",
+    ),
+    Feature(
+        "deck_colors_static",
+        enabled=lambda s: s.get("show_decks") and s.get("use_deck_colors") and not _animated(s),
+        requires=("deck_header",),
+        setup="deckNameElement.style.color = colors[0];",
+    ),
+    Feature(
+        "bold_colors",
+        enabled=lambda s: s.get("auto_color_bold") and not s.get("bold_colors_css"),
+        requires=("query_bold",),
+        setup="""boldElements.forEach((element, i) => {
+    if (i < colors.length) {
+        element.style.setProperty("color", colors[i], "important");
+    }
+});""",
+    ),
+    Feature(
+        "bold_colors_css",
+        enabled=lambda s: s.get("auto_color_bold") and s.get("bold_colors_css"),
+        css=_bold_css,
+    ),
+    Feature(
+        "cloze_style",
+        enabled=lambda s: _cloze_style(s) and not s.get("python_filters"),
+        requires=("query_clozes",),
+        cloze="""element.style.fontWeight = 'bold';
+element.style.color = "#0bba2e";""",
+    ),
+    Feature(
+        "cloze_css",
+        enabled=lambda s: _cloze_style(s) and s.get("python_filters"),
+        css=_cloze_css,
+    ),
+    Feature(
+        "blur",
+        enabled=lambda s: s.get("show_blur"),
+        setup="document.documentElement.classList.add('clzz-masked');",
+        css=lambda s: wrap_region("mask", MASK_CSS.get(s.get("mask_mode"), MASK_CSS["blur"]), css=True),
+    ),
+    Feature(
+        "blur_clozes",
+        enabled=lambda s: s.get("show_blur") and not s.get("python_filters"),
+        requires=("cloze_style", "blur"),
+        # Substituir o texto [...] pelo valor de `data-cloze`, escondido pela máscara
+        cloze="""if (element.innerText.includes('[...]')) {
+    element.innerText = element.getAttribute('data-cloze').replace(/<\\/?[^>]+(>|$)/g, '');
+    element.classList.add('clzz-hidden');
+}""",
+    ),
+    Feature(
+        "cloze_colors",
+        enabled=lambda s: s.get("use_cloze_colors") and _animated(s),
+        requires=("scheduler", "query_clozes"),
+        cloze="clzz.animate(element, colorsClz);",
+    ),
+    Feature(
+        "cloze_colors_static",
+        enabled=lambda s: s.get("use_cloze_colors") and not _animated(s) and not s.get("python_filters"),
+        requires=("cloze_style",),
+        cloze="element.style.color = colorsClz[0];",
+    ),
+    Feature(
+        "hints",
+        enabled=lambda s: s.get("show_hints") and s.get("show_blur"),
+        requires=("lifecycle", "blur"),
+        runtime=HINTS_JS,
+        setup=HINTS_SETUP_JS,
+    ),
+    Feature(
+        "custom_front",
+        enabled=lambda s: s.get("use_custom_front"),
+        front=lambda s: s.get("custom_front", ""),
+    ),
+    Feature(
+        "custom_back",
+        enabled=lambda s: s.get("use_custom_back"),
+        back=lambda s: s.get("custom_back", ""),
+    ),
+    Feature(
+        "css",
+        enabled=_always,
+        css=lambda s: wrap_region(
+            "base", "\n" + (s.get("custom_css", "") if s.get("use_custom_css") else BASIC_CSS) + "\n", css=True
+        ),
+    ),
+    Feature(
+        "static",
+        enabled=lambda s: not _animated(s),
+        css=wrap_region("static", STATIC_CSS, css=True),
+    ),
+]
+
+FEATURES_BY_NAME = dict((feature.name, feature) for feature in FEATURES)
+
+
+def resolve_features(settings):
+    """Returns the enabled features plus their dependencies, each once, dependencies first."""
+    ordered = []
+    seen = set()
+
+    def visit(name, stack=()):
+        if name in seen:
+            return
+        if name in stack:
+            raise ValueError(f"Circular feature dependency: {' -> '.join(stack + (name,))}")
+        feature = FEATURES_BY_NAME[name]
+        for required in feature.requires:
+            visit(required, stack + (name,))
+        seen.add(name)
+        ordered.append(feature)
+
+    for feature in FEATURES:
+        if feature.enabled(settings):
+            visit(feature.name)
+    return ordered
+
+
+def settings_hash(settings):
+    """Returns a stable hash of a settings dict."""
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _join(features, slot, settings, separator="\n"):
+    return separator.join(
+        fragment for fragment in (feature.render(slot, settings) for feature in features) if fragment
+    )
+
+
+def _size(text):
+    return len(text.encode("utf-8"))
+
+
+def _build(settings):
+    features = resolve_features(settings)
+
+    instrument = settings.get("instrument")
+    minify = not settings.get("readable")
+    runtime = _join(features, "runtime", settings)
+    source_runtime = runtime
+    if minify:
+        runtime = minify_js(runtime)
+    sizes = {"runtime": [_size(source_runtime), _size(runtime)]}
+
+    setup = []
+    for feature in features:
+        fragment = feature.render("setup", settings)
+        if fragment:
+            setup.append(fragment)
+            if instrument:
+                setup.append(f'clzzPerf.mark("{feature.name}");')
+    render = "\n".join(setup)
+
+    cloze = _join(features, "cloze", settings)
+    if cloze:
+        # Uma única passada por todos os .cloze
+        render += "\nelements.forEach(element => {\n" + cloze + "\n});"
+        if instrument:
+            render += '\nclzzPerf.mark("clozes");'
+    if instrument:
+        render = "clzzPerf.begin();\n" + render + "\nclzzPerf.end();"
+
+    head = _join(features, "head", settings, separator="")
+    runtime_file = None
+    if runtime and settings.get("runtime_media"):
+        # O runtime vai para um arquivo de mídia; o template só o carrega
+        runtime_file, runtime = runtime_asset(runtime)
+        tail = wrap_region("render", bootstrap_js(runtime_file, render))
+    else:
+        if runtime:
+            # Minificado junto com o resto do template, mais abaixo
+            head += wrap_region("runtime", f"<script>{source_runtime}</script>")
+        tail = wrap_region("render", f"<script>(function () {{\n{render}\n}})();</script>") if render else ""
+
+    # O script de render vem logo após a marcação do card, que ele consulta;
+    # a marcação personalizada (Custom Front/Back) fica depois dele. Tudo fica em
+    # regiões, sem nada entre elas, para apply_to_model poder regenerar o template todo.
+    card_index = features.index(FEATURES_BY_NAME["card"])
+    sides = {}
+    for side in ("front", "back"):
+        card = wrap_region("card", _join(features[:card_index + 1], side, settings, separator=""))
+        custom = wrap_region("custom", _join(features[card_index + 1:], side, settings, separator=""))
+        sides[side] = head + card + tail + custom
+    sides["css"] = _join(features, "css", settings, separator="")
+
+    # Minificação após a geração; "readable" mantém o código-fonte legível para edição
+    for side, minified in (("front", minify_html), ("back", minify_html), ("css", minify_css)):
+        sizes[side] = [_size(sides[side])]
+        if minify:
+            sides[side] = minified(sides[side])
+        sizes[side].append(_size(sides[side]))
+
+    return {
+        "qfmt": sides["front"],
+        "afmt": sides["back"],
+        "css": sides["css"],
+        "features": [feature.name for feature in features],
+        "runtime": runtime,
+        "runtime_file": runtime_file,
+        "sizes": {"qfmt": sizes["front"], "afmt": sizes["back"], "css": sizes["css"], "runtime": sizes["runtime"]},
+    }
+
+
+def compile_templates(settings):
+    """Compiles a Clzz settings dict into {"qfmt", "afmt", "css", "features", "runtime", "runtime_file", "sizes"}.
+
+    runtime_file is set when settings["runtime_media"] is on; the runtime must then be
+    written to the media folder (see runtime.write_runtime_asset).
+
+    Output is minified unless settings["readable"] is on; sizes maps qfmt, afmt, css and
+    runtime to [source bytes, output bytes].
+
+    Results are cached by a hash of the settings; callers get their own copy.
+    """
+    key = settings_hash(settings)
+    if key not in _cache:
+        if len(_cache) >= CACHE_SIZE:
+            _cache.pop(next(iter(_cache)))
+        _cache[key] = _build(settings)
+    # Cópia profunda: features e sizes são listas/dicts que o chamador pode alterar
+    return copy.deepcopy(_cache[key])
+
+
+def apply_to_model(model, settings):
+    """Regenerates the Clzz regions of an existing model from settings.
+
+    Only the marker-delimited regions of each template and of the CSS are replaced,
+    so hand edits outside them survive; for a model without hand edits the result is
+    exactly compile_templates(settings). Templates and CSS generated before the card
+    markup and main CSS had regions of their own are replaced whole. The settings are
+    stored in model["clzz"]. Returns the compiled output (the runtime file may still
+    need to be written).
+    """
+    compiled = compile_templates(settings)
+    for tmpl in model['tmpls']:
+        for side in ('qfmt', 'afmt'):
+            if "card" in region_names(tmpl[side]):
+                tmpl[side] = sync_regions(tmpl[side], compiled[side])
+            else:
+                tmpl[side] = compiled[side]
+    if "base" in region_names(model['css'], css=True):
+        model['css'] = sync_regions(model['css'], compiled['css'], css=True)
+    else:
+        model['css'] = compiled['css']
+    model['clzz'] = settings
+    return compiled
@@ -1,8 +1,16 @@
 from aqt import mw
+from aqt.operations import CollectionOp
 from aqt.qt import *
+from aqt.utils import askUser, showInfo
+from aqt.webview import AnkiWebView
 import json
-import os
-from aqt.utils import showInfo
+
+from .analyzer import analyze_model, format_report, format_sizes
+from .card_types import add_card_type, new_card_type
+from .compiler import compile_templates
+from .preview import PREVIEW_DEBOUNCE_MS, PREVIEW_HTML, preview_settings, render_side
+from .settings_store import DEFAULT_SETTINGS, get_store
+from .template_patch import parse_palette
 
 class ConfigDialog(QDialog):
     def __init__(self):
@@ -10,85 +18,24 @@ class ConfigDialog(QDialog):
         self.setWindowTitle("Clzz Card Type Configuration")
 
         # Default settings
-        self.default_settings = {
-            "card_type_name": "Clzz Card",
-            "show_decks": True,
-            "show_hints": True,
-            "show_blur": True,
-            "deck_colors": ["#FF6B6B", "#FFA463", "#FFFF6B", "#63FF91", "#63C4FF"],
-            "cloze_colors": ["#0BBA2E", "#0BBA5D"],
-            "custom_front": """<script></script>""",
-            "custom_back": """<script></script>""",
-            "custom_css_checkbox": True,
-            "custom_css": """@font-face {
-  font-family: cheltenham-it;
-  src: url(_cheltenham-italic-700.woff2);
-}
-
-@font-face {
-  font-family: 'imWriter';
-  src: url(_iAWriter.ttf);
-}
-
-@font-face {
-  font-family: 'franklin';
-  src: url(_franklin-normal-500.woff2);
-}
-
-.card {
-    font-family: 'imWriter', 'Yu Gothic Medium', 'Samsung Sans', 'Roboto', sans-serif;
-    font-size: 24px;
-    text-align: center;
-    line-height: 2.4rem;
-    margin: auto 200px;
-}
-
-.cloze {
-    font-weigth: bold;
-}
-
-
-.deck-name {
-    font-family: 'cheltenham-it', 'imperial';
-    font-size: 2rem;
-    font-weight: bold;
-    margin-top: 20px;
-    padding-bottom: 40px;
-}
-
-code {
-    font-family: SF Mono, 'Consolas', 'Fira Sans', courier, monospaced;
-}
-
-#extra {
-    margin-top: 15px
-}
-
-@media screen and (max-width: 400px) {
-    .deck-name {
-        font-size: 1.6rem;
-        margin-top: 10px;
-        padding-bottom: 10px;
-    }
-
-    .card {
-        font-family: 'franklin', 'Yu Gothic Medium', 'Samsung Sans', 'Roboto', sans-serif;
-        font-size: 20px;
-        text-align: center;
-        line-height: 2rem;
-        margin: auto 10px;
-    }
-}
-""",
-            "auto_color_bold": True,
-        }
+        self.default_settings = DEFAULT_SETTINGS
+        self.store = get_store()
 
         # UI elements
+        self.preset_label = QLabel("Preset:")
+        self.preset_combobox = QComboBox()
+        self.save_preset_button = QPushButton("Save As...")
+        self.delete_preset_button = QPushButton("Delete")
         self.card_type_name_label = QLabel("Card Type Name:")
         self.card_type_name_input = QLineEdit()
         self.show_decks_checkbox = QCheckBox("Show current deck as header")
         self.show_hints_checkbox = QCheckBox("Enable toggable hints")
         self.show_blur_checkbox = QCheckBox("Show Cloze as Blur")
+        self.mask_mode_label = QLabel("Cloze mask:")
+        self.mask_mode_combobox = QComboBox()
+        self.mask_mode_combobox.addItem("Blur", "blur")
+        self.mask_mode_combobox.addItem("Text shadow", "shadow")
+        self.mask_mode_combobox.addItem("Bars", "bars")
         self.deck_colors_checkbox = QCheckBox("Deck Colors")
         self.deck_colors_input = QLineEdit()
         self.cloze_colors_checkbox = QCheckBox("Cloze Colors")
@@ -107,6 +54,30 @@ code {
         self.custom_css_input.setFontFamily("Courier New")
         
         self.auto_color_bold_checkbox = QCheckBox("Auto Color Bold")
+        self.bold_colors_css_checkbox = QCheckBox("Color bold text with CSS")
+        self.bold_colors_css_checkbox.setToolTip(
+            "Colors bold text without scripts. Colors are counted per block: bold text in the Extra\n"
+            "field, in each list item or paragraph starts again at the first color, and <b> and\n"
+            "<strong> are counted separately. Without this option the colors follow the bold text\n"
+            "of the whole card, in order."
+        )
+        self.disable_animations_checkbox = QCheckBox("Disable Animations")
+        self.runtime_media_checkbox = QCheckBox("Share runtime as media file")
+        self.instrument_checkbox = QCheckBox("Report render timings")
+
+        # Pré-visualização de um card de exemplo com as opções atuais
+        self.preview_side_combobox = QComboBox()
+        self.preview_side_combobox.addItem("Front", "qfmt")
+        self.preview_side_combobox.addItem("Back", "afmt")
+        self.preview_webview = AnkiWebView(parent=self, title="clzz preview")
+        self.preview_webview.setMinimumWidth(360)
+        self.size_label = QLabel()
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DEBOUNCE_MS)
+        self._preview_state = {}
+        self.python_filters_checkbox = QCheckBox("Render deck header and clozes in Python (desktop only)")
+        self.readable_checkbox = QCheckBox("Readable templates (no minification)")
 
         # Layouts
         main_layout = QVBoxLayout()
@@ -115,12 +86,29 @@ code {
         button_layout = QHBoxLayout()
 
         # Add widgets to layouts
+        preset_layout = QHBoxLayout()
+        preset_layout.addWidget(self.preset_label)
+        preset_layout.addWidget(self.preset_combobox, 1)
+        preset_layout.addWidget(self.save_preset_button)
+        preset_layout.addWidget(self.delete_preset_button)
+        main_layout.addLayout(preset_layout)
+
         top_layout.addWidget(self.card_type_name_label, 0, 0)
         top_layout.addWidget(self.card_type_name_input, 0, 1)
         top_layout.addWidget(self.show_decks_checkbox, 1, 0)
         top_layout.addWidget(self.show_hints_checkbox, 2, 0)
         top_layout.addWidget(self.show_blur_checkbox, 3, 0)
+        mask_layout = QHBoxLayout()
+        mask_layout.addWidget(self.mask_mode_label)
+        mask_layout.addWidget(self.mask_mode_combobox, 1)
+        top_layout.addLayout(mask_layout, 3, 2)
+        top_layout.addWidget(self.disable_animations_checkbox, 0, 2)
         top_layout.addWidget(self.auto_color_bold_checkbox, 2, 1)
+        top_layout.addWidget(self.bold_colors_css_checkbox, 2, 2)
+        top_layout.addWidget(self.runtime_media_checkbox, 3, 1)
+        top_layout.addWidget(self.instrument_checkbox, 1, 1)
+        top_layout.addWidget(self.python_filters_checkbox, 1, 2)
+        top_layout.addWidget(self.readable_checkbox, 4, 2)
 
         color_layout.addWidget(self.deck_colors_checkbox)
         color_layout.addWidget(self.deck_colors_input)
@@ -149,7 +137,15 @@ code {
         button_layout.addWidget(cancel_button)
         main_layout.addLayout(button_layout)
 
-        self.setLayout(main_layout)
+        preview_layout = QVBoxLayout()
+        preview_layout.addWidget(self.preview_side_combobox)
+        preview_layout.addWidget(self.preview_webview, 1)
+        preview_layout.addWidget(self.size_label)
+
+        outer_layout = QHBoxLayout()
+        outer_layout.addLayout(main_layout)
+        outer_layout.addLayout(preview_layout, 1)
+        self.setLayout(outer_layout)
 
         # Connect signals to slots
         self.deck_colors_checkbox.stateChanged.connect(self.toggle_deck_colors_input)
@@ -157,53 +153,124 @@ code {
         self.custom_front_checkbox.stateChanged.connect(self.toggle_custom_front_input)
         self.custom_back_checkbox.stateChanged.connect(self.toggle_custom_back_input)
         self.custom_css_checkbox.stateChanged.connect(self.toggle_custom_css_input)
+        self.show_blur_checkbox.stateChanged.connect(self.toggle_mask_mode_input)
+        self.auto_color_bold_checkbox.stateChanged.connect(self.toggle_bold_colors_css_input)
+
+        self.preset_combobox.currentTextChanged.connect(self.switch_preset)
+        self.save_preset_button.clicked.connect(self.save_preset_as)
+        self.delete_preset_button.clicked.connect(self.delete_preset)
+
+        # Qualquer edição reagenda a pré-visualização (debounce)
+        self.preview_timer.timeout.connect(self.update_preview)
+        for checkbox in self.findChildren(QCheckBox):
+            checkbox.stateChanged.connect(self.schedule_preview)
+        for line_edit in (self.deck_colors_input, self.cloze_colors_input):
+            line_edit.textChanged.connect(self.schedule_preview)
+        for text_edit in (self.custom_front_input, self.custom_back_input, self.custom_css_input):
+            text_edit.textChanged.connect(self.schedule_preview)
+        self.mask_mode_combobox.currentIndexChanged.connect(self.schedule_preview)
+        self.preview_side_combobox.currentIndexChanged.connect(self.update_preview)
+        self.preview_webview.stdHtml(PREVIEW_HTML, context=self)
 
         # Load and display settings
-
-
-        self.restore_defaults();
-
-    def load_default_settings(self):
-        with open(os.path.join(os.path.dirname(__file__), "config.json"), "r") as f:
-            self.default_settings = json.load(f)
-
-    def load_user_settings(self):
-        try:
-            with open(os.path.join(os.path.dirname(__file__), "user_settings.json"), "r") as f:
-                self.user_settings = json.load(f)
-        except FileNotFoundError:
-            self.user_settings = {}
-
-        self.card_type_name_input.setText(self.user_settings.get("card_type_name", self.default_settings["card_type_name"]))
-        self.show_decks_checkbox.setChecked(self.user_settings.get("show_decks", self.default_settings["show_decks"]))
-        self.show_hints_checkbox.setChecked(self.user_settings.get("show_hints", self.default_settings["show_hints"]))
-        self.show_blur_checkbox.setChecked(self.user_settings.get("show_blur", self.default_settings["show_blur"]))
-        self.deck_colors_checkbox.setChecked(self.user_settings.get("use_deck_colors", True))
-        self.deck_colors_input.setText(",".join(self.user_settings.get("deck_colors", self.default_settings["deck_colors"])))
-        self.toggle_deck_colors_input(self.deck_colors_checkbox.checkState())
-        self.cloze_colors_checkbox.setChecked(self.user_settings.get("use_cloze_colors", True))
-        self.cloze_colors_input.setText(",".join(self.user_settings.get("cloze_colors", self.default_settings["cloze_colors"])))
-        self.toggle_cloze_colors_input(self.cloze_colors_checkbox.checkState())
-        self.custom_front_checkbox.setChecked(self.user_settings.get("use_custom_front", True))
-        self.custom_front_input.setPlainText(self.user_settings.get("custom_front", self.default_settings["custom_front"]))
-        self.toggle_custom_front_input(self.custom_front_checkbox.checkState())
-        self.custom_back_checkbox.setChecked(self.user_settings.get("use_custom_back", True))
-        self.custom_back_input.setPlainText(self.user_settings.get("custom_back", self.default_settings["custom_back"]))
-        self.toggle_custom_back_input(self.custom_back_checkbox.checkState())
-        self.custom_css_checkbox.setChecked(self.user_settings.get("use_custom_css", True))
-        self.custom_css_input.setPlainText(self.user_settings.get("custom_css", self.default_settings["custom_css"]))
-        self.auto_color_bold_checkbox.setChecked(self.user_settings.get("auto_color_bold", self.default_settings["auto_color_bold"]))
-
-    def save_settings(self):
-        user_settings = {
+        self.update_preset_list()
+        self.show_settings(self.store.get())
+        self.update_preview()
+
+    def show_settings(self, settings):
+        """Fills the dialog with a settings dict."""
+        self.card_type_name_input.setText(settings["card_type_name"])
+        self.show_decks_checkbox.setChecked(settings["show_decks"])
+        self.show_hints_checkbox.setChecked(settings["show_hints"])
+        self.show_blur_checkbox.setChecked(settings["show_blur"])
+        self.mask_mode_combobox.setCurrentIndex(max(self.mask_mode_combobox.findData(settings["mask_mode"]), 0))
+        self.toggle_mask_mode_input(settings["show_blur"])
+        self.deck_colors_checkbox.setChecked(settings["use_deck_colors"])
+        self.deck_colors_input.setText(",".join(settings["deck_colors"]))
+        self.toggle_deck_colors_input(settings["use_deck_colors"])
+        self.cloze_colors_checkbox.setChecked(settings["use_cloze_colors"])
+        self.cloze_colors_input.setText(",".join(settings["cloze_colors"]))
+        self.toggle_cloze_colors_input(settings["use_cloze_colors"])
+        self.custom_front_checkbox.setChecked(settings["use_custom_front"])
+        self.custom_front_input.setPlainText(settings["custom_front"])
+        self.toggle_custom_front_input(settings["use_custom_front"])
+        self.custom_back_checkbox.setChecked(settings["use_custom_back"])
+        self.custom_back_input.setPlainText(settings["custom_back"])
+        self.toggle_custom_back_input(settings["use_custom_back"])
+        self.custom_css_checkbox.setChecked(settings["use_custom_css"])
+        self.custom_css_input.setPlainText(settings["custom_css"])
+        self.toggle_custom_css_input(settings["use_custom_css"])
+        self.auto_color_bold_checkbox.setChecked(settings["auto_color_bold"])
+        self.bold_colors_css_checkbox.setChecked(settings["bold_colors_css"])
+        self.toggle_bold_colors_css_input(settings["auto_color_bold"])
+        self.disable_animations_checkbox.setChecked(settings["disable_animations"])
+        self.runtime_media_checkbox.setChecked(settings["runtime_media"])
+        self.instrument_checkbox.setChecked(settings["instrument"])
+        self.python_filters_checkbox.setChecked(settings["python_filters"])
+        self.readable_checkbox.setChecked(settings["readable"])
+
+    def schedule_preview(self, *args):
+        """Updates the preview once the edits stop for PREVIEW_DEBOUNCE_MS."""
+        self.preview_timer.start()
+
+    def update_preview(self, *args):
+        """Patches the preview webview with whatever changed since the last update."""
+        self.preview_timer.stop()
+        settings = self.collect_settings()
+        self.size_label.setText(format_sizes(compile_templates(settings)["sizes"], self.store.cost_budget()))
+        compiled = compile_templates(preview_settings(settings))
+        side = self.preview_side_combobox.currentData()
+        state = {
+            "css": compiled["css"],
+            "card": render_side(compiled[side], question=side == "qfmt"),
+        }
+        # Só o que mudou vai para o webview: editar o CSS não recria o card
+        if state["css"] != self._preview_state.get("css"):
+            self.preview_webview.eval(f"clzzPreview.setCss({json.dumps(state['css'])});")
+        if state["card"] != self._preview_state.get("card"):
+            self.preview_webview.eval(f"clzzPreview.setCard({json.dumps(state['card'])});")
+        self._preview_state = state
+
+    def update_preset_list(self):
+        """Lists the saved presets and selects the active one."""
+        self.preset_combobox.blockSignals(True)
+        self.preset_combobox.clear()
+        self.preset_combobox.addItems(self.store.preset_names())
+        self.preset_combobox.setCurrentText(self.store.active_name())
+        self.preset_combobox.blockSignals(False)
+
+    def switch_preset(self, name):
+        """Shows the settings of another preset."""
+        if name:
+            self.store.set_active(name)
+            self.show_settings(self.store.get(name))
+
+    def save_preset_as(self):
+        """Saves the current settings as a new named preset."""
+        name, ok = QInputDialog.getText(self, "Save Preset", "Preset name:")
+        name = name.strip()
+        if ok and name:
+            self.store.save(self.collect_settings(), name)
+            self.update_preset_list()
+
+    def delete_preset(self):
+        """Deletes the selected preset and goes back to the default one."""
+        self.store.delete(self.preset_combobox.currentText())
+        self.update_preset_list()
+        self.show_settings(self.store.get())
+
+    def collect_settings(self):
+        """Returns the current state of the dialog as a settings dict."""
+        return {
             "card_type_name": self.card_type_name_input.text(),
             "show_decks": self.show_decks_checkbox.isChecked(),
             "show_hints": self.show_hints_checkbox.isChecked(),
             "show_blur": self.show_blur_checkbox.isChecked(),
+            "mask_mode": self.mask_mode_combobox.currentData(),
             "use_deck_colors": self.deck_colors_checkbox.isChecked(),
-            "deck_colors": self.deck_colors_input.text().split(","),
+            "deck_colors": parse_palette(self.deck_colors_input.text()),
             "use_cloze_colors": self.cloze_colors_checkbox.isChecked(),
-            "cloze_colors": self.cloze_colors_input.text().split(","),
+            "cloze_colors": parse_palette(self.cloze_colors_input.text()),
             "use_custom_front": self.custom_front_checkbox.isChecked(),
             "custom_front": self.custom_front_input.toPlainText(),
             "use_custom_back": self.custom_back_checkbox.isChecked(),
@@ -211,62 +278,30 @@ code {
             "use_custom_css": self.custom_css_checkbox.isChecked(),
             "custom_css": self.custom_css_input.toPlainText(),
             "auto_color_bold": self.auto_color_bold_checkbox.isChecked(),
+            "bold_colors_css": self.bold_colors_css_checkbox.isChecked(),
+            "disable_animations": self.disable_animations_checkbox.isChecked(),
+            "runtime_media": self.runtime_media_checkbox.isChecked(),
+            "instrument": self.instrument_checkbox.isChecked(),
+            "python_filters": self.python_filters_checkbox.isChecked(),
+            "readable": self.readable_checkbox.isChecked(),
         }
 
+    def save_settings(self):
+        user_settings = self.collect_settings()
+
         try:
-            with open(os.path.join(os.path.dirname(__file__), "user_settings.json"), "w") as f:
-                json.dump(user_settings, f, indent=4)
+            self.store.save(user_settings)
             self.create_card_type()
             # showInfo("Card Type created successfully!")
         except Exception as e:
             showInfo(f"Error creating card type: {e}")
 
-    def load_settings(self):
-        """Carregar as configurações do arquivo ou usar valores padrão"""
-        settings_file = self.get_settings_file()
-        try:
-            with open(settings_file, "r") as f:  # Correct indentation here
-                self.user_settings = json.load(f)
-        except FileNotFoundError:
-            self.user_settings = {}
-        
-        if os.path.exists(settings_file):
-            with open(settings_file, "r") as file:
-                settings = json.load(file)
-                self.show_hints_checkbox.setChecked(settings.get("show_hints", False))
-                self.show_blur_checkbox.setChecked(settings.get("show_blur", False))
-                self.current_colors = settings.get("colors", self.default_settings["deck_colors"]) 
-
-
-                self.custom_css_input.setPlainText(self.default_settings["custom_css"])
-                # Carregar cores salvas (similar to previous implementation)
-
     def restore_defaults(self):
-        self.card_type_name_input.setText(self.default_settings["card_type_name"])
-        self.show_decks_checkbox.setChecked(self.default_settings["show_decks"])
-        self.show_hints_checkbox.setChecked(self.default_settings["show_hints"])
-        self.show_blur_checkbox.setChecked(self.default_settings["show_blur"])
-        self.deck_colors_checkbox.setChecked(True)
-        self.deck_colors_input.setText(",".join(self.default_settings["deck_colors"]))
-        self.toggle_deck_colors_input(True)
-        self.cloze_colors_checkbox.setChecked(True)
-        self.cloze_colors_input.setText(",".join(self.default_settings["cloze_colors"]))
-        self.toggle_cloze_colors_input(True)
-        self.custom_front_checkbox.setChecked(True)
-        self.custom_front_input.setPlainText(self.default_settings["custom_front"])
-        self.toggle_custom_front_input(True)
-        self.custom_back_checkbox.setChecked(True)
-        self.custom_back_input.setPlainText(self.default_settings["custom_back"])
-        self.toggle_custom_back_input(True)
-        self.custom_css_checkbox.setChecked(True)
-        self.custom_css_input.setPlainText(self.default_settings["custom_css"])
-        self.toggle_custom_css_input(True)
-        self.auto_color_bold_checkbox.setChecked(self.default_settings["auto_color_bold"])
+        self.show_settings(self.default_settings)
 
     def create_card_type(self):
-        card_type_name = self.card_type_name_input.text().strip()
-        colorsHTML = self.deck_colors_input.text().strip()
-        colorsClzHTML = self.cloze_colors_input.text().strip()
+        settings = self.collect_settings()
+        card_type_name = settings["card_type_name"].strip()
 
         if not card_type_name:
             showInfo("Please enter a Card Type Name.")
@@ -281,256 +316,30 @@ code {
             return
 
         # Create a new card type
-        model = mw.col.models.new(card_type_name)
-        # model["tmpls"].append({})
-        # model["tmpls"][0]["qfmt"] = "{{FrontSide}}"
-        # model["tmpls"][0]["afmt"] = "{{FrontSide}}\n\n<hr id=answer>\n{{BackSide}}"
-
-        mm.add_field(model, mm.new_field("Text"))
-        mm.add_field(model, mm.new_field("Extra"))
-
-        # Adiciona o template Cloze com a estrutura HTML personalizada
-        template = {
-            "name": card_type_name,
-            "qfmt": """
-<script>
-    var boldElements = document.querySelectorAll("b, strong");
-    var elements = document.querySelectorAll('.cloze');
-    var keyDownHandled = false;
-    var other = ["#FF6B6B", "#FFA463", "#FFFF6B"];
-    function animateColor(element, array) {
-        let colorIndex = 0;
-        element.style.transition = "color 2s ease-in-out";
-        setInterval(() => {
-            element.style.color = array[colorIndex]; // Aplica a cor
-            colorIndex = (colorIndex + 1) % array.length; // Alterna as cores
-        }, 3000); // Muda a cor a cada 1 segundo (1000 ms)
-    }</script>""",  
-            "afmt": """<script>
-    var boldElements = document.querySelectorAll("b, strong");
-    var elements = document.querySelectorAll('.cloze');
-    var keyDownHandled = false;
-    
-    var other = ["#FF6B6B", "#FFA463", "#FFFF6B"];
-    var colorsClz = ["#0bba2e", "#0bba5d", "#0bba5d", "#0bba5d"]; 
-    function animateColor(element, array) {
-        let colorIndex = 0;
-        element.style.transition = "color 2s ease-in-out";
-        setInterval(() => {
-            element.style.color = array[colorIndex]; // Aplica a cor
-            colorIndex = (colorIndex + 1) % array.length; // Alterna as cores
-        }, 3000); // Muda a cor a cada 1 segundo (1000 ms)
-    }</script>
-            """
-            # "afmt": "{{cloze:Text}}<br>{{Extra}}",
-        }
-        
-    
-        # Adiciona o modelo ao banco de dados
-
-        # coment bellow
-        # Set CSS
-        if self.auto_color_bold_checkbox.isChecked():
-            try:  
-                htmlEl = f'<script> var colors = [{colorsHTML}]; </script>'
-            except json.JSONDecodeError:
-                print(f"Error: Invalid JSON format for colorsClzHTML: {colorsHTML}")
-                # Handle the error, e.g., display an error message to the user
-                htmlEl = """<script>var colors = ["#FF6B6B", "#FFA463", "#FFFF6B", "#63FF91", "#63C4FF", "#B163FF", "#FF63D2", "#F7C294", "#A3D8A3", "#92B5E9"];</script>"""            
-
-            
-            template["qfmt"] += htmlEl
-            template['afmt'] += htmlEl
-
-        if self.cloze_colors_checkbox.isChecked():
-            try:
-                htmlEl = f'<script> var colorsClz = [{colorsClzHTML}]; </script>'
-            except json.JSONDecodeError:
-                print(f"Error: Invalid JSON format for colorsClzHTML: {colorsClzHTML}")
-                # Handle the error, e.g., display an error message to the user
-                htmlEl = """<script>var colorsClz = ["#0bba2e", "#0bba5d", "#0bba5d", "#0bba5d"];</script>"""            
-
-            template["qfmt"] += htmlEl
-            template['afmt'] += htmlEl
-
-
-
-        if self.custom_css_checkbox.isChecked():
-            model["css"] = self.custom_css_input.toPlainText()
-        else:
-            model["css"] = """
-            .card {
-    font-family: arial;
-    font-size: 20px;
-    text-align: center;
-    color: black;
-    background-color: white;
-}
-.cloze {
-    font-weight: bold;
-    color: blue;
-}
-.nightMode .cloze {
-    color: lightblue;
-}"""
-
-        if self.show_decks_checkbox.isChecked():
-            template["qfmt"] += """<span class="clzz"></span><div class="deck-name">{{Subdeck}}</div>{{cloze:Text}}"""
-            template['afmt'] += """<span class="clzz"></span><div class="deck-name">{{Subdeck}}</div>
-{{cloze:Text}}<br>
-<div id='extra'>{{Extra}}</div>"""
-        else:
-            template['qfmt'] += """<span class="clzz"></span>{{cloze:Text}}"""
-            template['afmt'] += """<span class="clzz"></span>{{cloze:Text}}<br>
-<div id='extra'>{{Extra}}</div>"""
-
-        # # Set deck colors (if enabled)
-        if self.deck_colors_checkbox.isChecked():
-            template["qfmt"] += """<script>var deckNameElement = document.querySelector('.deck-name');
-var updatedText = deckNameElement.innerText.replace(/^\d+/g, '').trim();
-deckNameElement.innerText = updatedText;
-deckNameElement.style.color = "#FF6B6B";
-animateColor(deckNameElement, other);
-</script>"""
-            template["afmt"] += """<script>var deckNameElement = document.querySelector('.deck-name');
-var updatedText = deckNameElement.innerText.replace(/^\d+/g, '').trim();
-deckNameElement.innerText = updatedText;
-deckNameElement.style.color = "#FF6B6B";
-animateColor(deckNameElement, other);
-</script>"""
-
-
-        if self.auto_color_bold_checkbox.isChecked():
-            template["qfmt"] += """<script>
-                boldElements.forEach(element => { color = colors.shift(); element.style.setProperty("color", color, "important"); })
-            </script>
-            """
-
-            template["afmt"] += """<script>
-                boldElements.forEach(element => { color = colors.shift(); element.style.setProperty("color", color, "important"); })
-            </script>
-            """
-
-        if self.show_blur_checkbox.isChecked():
-            htmlEl = """<script>
-                elements.forEach(element => {
-    element.style.fontWeight = 'bold'
-    element.style.color = "#0bba2e"
-    // Obter o valor do atributo `data-cloze`
-    text = element.getAttribute('data-cloze');
-       
-    // Substituir o texto interno pelo valor de `data-cloze`
-    if (element.innerText.includes('[...]')) {
-        element.innerText = text.replace(/<\/?[^>]+(>|$)/g, '');
-        element.style.filter = 'blur(7px)';
-    }
-       
-    // Adicionar o efeito de blur via CSS
-    animateColor(element, colorsClz);
-})
-            </script>
-            """
-            template["qfmt"] += htmlEl
-
-            template["afmt"] += htmlEl
-        
-
-        if self.show_hints_checkbox.isChecked():
-            htmlEl = """
-<script>
-document.addEventListener('keydown', (event) => {
-    if (event.key.toLowerCase() === 'h' && !event.repeat && !keyDownHandled) {
-        keyDownHandled = true;
-        elements.forEach(element => {
-        if (element.innerText.substring(0,1) == '[') {
-            if (element.style.filter === 'blur(7px)') {
-                element.style.filter = 'none';
-            } else {
-                element.style.filter = 'blur(7px)';
-            }
-        }
-        });
-    }
-});
-
-document.addEventListener('keyup', (event) => {
-    if (event.key.toLowerCase() === 'h') {
-        keyDownHandled = false; // Permitir próximo disparo
-    }
-});
-</script>
-            """
-            template["qfmt"] += htmlEl
-
-            template["afmt"] += htmlEl
-
-        if self.cloze_colors_checkbox.isChecked():
-            htmlEl = """
-            <script>
-        elements.forEach(element => {
-            element.style.fontWeight = 'bold'
-            element.style.color = "#0bba2e"
-            // Obter o valor do atributo `data-cloze`
-            text = element.getAttribute('data-cloze');
-           
-            // Substituir o texto interno pelo valor de `data-cloze`
-            console.log('previous Text:', element.innerText)
-            if (element.innerText.includes('[...]')) {
-                element.innerText = text.replace(/<\/?[^>]+(>|$)/g, '');
-                element.style.filter = 'blur(7px)';
-            }        
-            animateColor(element, colorsClz);
-        })</script>
-            """
-
-            template["qfmt"] += htmlEl
-
-            template["afmt"] += htmlEl
-
-        if not self.auto_color_bold_checkbox.isChecked():
-            htmlEl = """
-            <script>
-            elements.forEach(element => {
-                element.style.fontWeight = 'bold'
-                element.style.color = "blue"
-                // Obter o valor do atributo `data-cloze`
-                text = element.getAttribute('data-cloze');
-               
-                // Substituir o texto interno pelo valor de `data-cloze`
-                console.log('previous Text:', element.innerText)
-                if (element.innerText.includes('[...]')) {
-                    element.innerText = text.replace(/<\/?[^>]+(>|$)/g, '');
-                    element.style.filter = 'blur(7px)';
-                }        
-            })</script>
-            """
-
-            template["qfmt"] += htmlEl
-
-            template["afmt"] += htmlEl
-        # css
+        model, compiled = new_card_type(mw.col, settings)
+
+        # Verificação de custo de render antes de gravar
+        report = analyze_model(model, self.store.cost_budget())
+        if report["warnings"] and not askUser(
+            format_report(report) + "\n\n" + format_sizes(compiled["sizes"], self.store.cost_budget())
+            + "\n\nCreate the card type anyway?", parent=self
+        ):
+            return
 
+        def op(col):
+            return add_card_type(col, model, compiled)
 
+        # Grava em segundo plano, com suporte a desfazer; sem mw.reset()
+        CollectionOp(parent=mw, op=op).success(
+            lambda changes: showInfo("O tipo de nota '" + card_type_name + "' foi criado com sucesso!")
+        ).run_in_background()
         
-        
-
-
-        # if self.custom_back_checkbox.isChecked():
-        #     model["tmpls"][0]["afmt"] = self.custom_back_input.toPlainText()
 
-        # Auto-color bold elements
-        # if self.auto_color_bold_checkbox.isChecked():
-            # model["css"] += "\n.card .cloze:not(.cloze-deletion) b { color: red; }"
+    def toggle_mask_mode_input(self, state):
+        self.mask_mode_combobox.setEnabled(bool(state))
 
-        model["tmpls"] = [template]  # Define os templates
-        model["type"] = 1  # Define como Cloze
-
-        # mw.models.save(model)
-        # mw.reset()
-        mm.add(model)
-        mw.reset()
-        showInfo("O tipo de nota '" + card_type_name + "' foi criado com sucesso!")
-        
+    def toggle_bold_colors_css_input(self, state):
+        self.bold_colors_css_checkbox.setEnabled(bool(state))
 
     def toggle_deck_colors_input(self, state):
         self.deck_colors_input.setEnabled(state)  # Use state directly
@@ -550,7 +359,3 @@ document.addEventListener('keyup', (event) => {
     def apply_settings(self):
         self.save_settings()  # Call the save_settings method to save changes
         self.close()  # Close the dialog after applying settings
-
-    def get_settings_file(self):
-        """Returns the path to the user settings file."""
-        return os.path.join(os.path.dirname(__file__), "user_settings.json")
@@ -0,0 +1,79 @@
+import html
+import re
+
+# Filtro de template {{clzz-deck:Subdeck}}: o nome do deck chega pronto ao card
+DECK_FILTER = "clzz-deck"
+
+# Filtro {{clzz:cloze:Text}}: recebe as clozes já renderizadas pelo Anki e revela o
+# texto escondido, marcado com clzz-hidden para a máscara
+CLOZE_FILTER = "clzz"
+
+DECK_CACHE_SIZE = 512
+CLOZE_CACHE_SIZE = 256
+
+LEADING_DIGITS_RE = re.compile(r"^\d+")
+HIDDEN_CLOZE_RE = re.compile(r'<span class="cloze" data-cloze="([^"]*)"([^>]*)>([^<]*)</span>')
+TAG_RE = re.compile(r"</?[^>]+(>|$)")
+
+_deck_cache = {}
+_cloze_cache = {}
+
+
+def deck_display_name(name):
+    """Returns the deck name shown in the header, without its leading ordering digits."""
+    return LEADING_DIGITS_RE.sub("", name).strip()
+
+
+def deck_header(did, name):
+    """Returns the header text of a deck, caching the least recently used decks by id."""
+    entry = _deck_cache.pop(did, None)
+    if entry is None or entry[0] != name:
+        entry = (name, deck_display_name(name))
+        if len(_deck_cache) >= DECK_CACHE_SIZE:
+            _deck_cache.pop(next(iter(_deck_cache)))
+    _deck_cache[did] = entry
+    return entry[1]
+
+
+def _reveal(match):
+    if "[...]" not in match.group(3):
+        # Clozes com dica ([hint]) ficam como estão
+        return match.group(0)
+    text = TAG_RE.sub("", html.unescape(match.group(1)))
+    return f'<span class="cloze clzz-hidden"{match.group(2)}>{html.escape(text, quote=False)}</span>'
+
+
+def reveal_clozes(cloze_html):
+    """Replaces the [...] of each rendered cloze with its hidden text, classed clzz-hidden."""
+    return HIDDEN_CLOZE_RE.sub(_reveal, cloze_html)
+
+
+def cloze_markup(key, cloze_html):
+    """Returns reveal_clozes(cloze_html), memoized by key (note id, mtime, card ordinal, ...)."""
+    if key not in _cloze_cache:
+        if len(_cloze_cache) >= CLOZE_CACHE_SIZE:
+            _cloze_cache.pop(next(iter(_cloze_cache)))
+        _cloze_cache[key] = reveal_clozes(cloze_html)
+    return _cloze_cache[key]
+
+
+def on_field_filter(field_text, field_name, filter_name, ctx):
+    """Applies the Clzz field filters; other filters pass through unchanged."""
+    if filter_name == DECK_FILTER:
+        card = ctx.card()
+        # Em decks filtrados, {{Subdeck}} é o deck de origem do card
+        return deck_header(card.odid or card.did, field_text)
+    if filter_name == CLOZE_FILTER:
+        note = ctx.note()
+        if not note.id:
+            # Nota ainda não salva (pré-visualização do editor): sem cache
+            return reveal_clozes(field_text)
+        key = (note.id, note.mod, ctx.card().ord, field_name, ctx.question_side)
+        return cloze_markup(key, field_text)
+    return field_text
+
+
+def on_operation_did_execute(changes, handler):
+    # Decks renomeados ou apagados
+    if getattr(changes, "deck", False):
+        _deck_cache.clear()
@@ -1,7 +1,19 @@
 from aqt import mw
+from aqt.operations import CollectionOp, QueryOp
 from aqt.qt import *
-from aqt.utils import showInfo
-import re
+from aqt.utils import askUser, showInfo, showText, tooltip
+import copy
+
+from .analyzer import analyze_model, format_report
+from .card_types import apply_card_type_changes, update_card_types
+from .model_index import ClzzModelIndex
+from .render_stats import stats as render_stats
+from .settings_store import get_store
+from .template_patch import model_digest, model_vars, parse_palette
+
+# Quantos card types encontrados são enviados de uma vez para a lista
+SCAN_BATCH_SIZE = 20
+
 
 class ManageDialog(QDialog):
     def __init__(self):
@@ -16,17 +28,24 @@ class ManageDialog(QDialog):
         # Parte esquerda do layout
         left_layout = QVBoxLayout()
 
-        # Combobox para listar os card types
-        self.card_type_combobox = QComboBox()
-        self.card_type_combobox.setPlaceholderText("Select a card type")
-        self.card_type_combobox.currentIndexChanged.connect(self.show_card_type_details)
-        left_layout.addWidget(self.card_type_combobox)
-
-        # Combobox para selecionar a visualização (Front, Back, CSS)
+        # Lista dos card types; vários podem ser selecionados para edição em lote
+        self.card_type_list = QListWidget()
+        self.card_type_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.card_type_list.setSortingEnabled(True)
+        self.card_type_list.currentItemChanged.connect(self.update_template_list)
+        self.card_type_list.itemSelectionChanged.connect(self.show_card_type_details)
+        left_layout.addWidget(self.card_type_list)
+
+        # Combobox para selecionar o template e a visualização (Front, Back, CSS)
+        view_layout = QHBoxLayout()
+        self.template_combobox = QComboBox()
+        self.template_combobox.currentIndexChanged.connect(self.update_details_view)
+        view_layout.addWidget(self.template_combobox, 1)
         self.view_combobox = QComboBox()
         self.view_combobox.addItems(["Front", "Back", "CSS"])
         self.view_combobox.currentIndexChanged.connect(self.update_details_view)
-        left_layout.addWidget(self.view_combobox)
+        view_layout.addWidget(self.view_combobox)
+        left_layout.addLayout(view_layout)
 
         # Caixa de texto para exibir os detalhes
         self.details_textbox = QTextEdit()
@@ -61,19 +80,30 @@ class ManageDialog(QDialog):
         disable_animations_layout = QHBoxLayout()
         self.disable_animations_label = QLabel("Disable Animations:")
         self.disable_animations_checkbox = QCheckBox()
+        self.disable_animations_checkbox.clicked.connect(
+            lambda: self.disable_animations_checkbox.setTristate(False)
+        )
         disable_animations_layout.addWidget(self.disable_animations_label)
         disable_animations_layout.addWidget(self.disable_animations_checkbox)
         right_layout.addLayout(disable_animations_layout)
 
+        # Tempos de render enviados pelos cards instrumentados
+        self.render_stats_label = QLabel()
+        self.render_stats_label.setWordWrap(True)
+        right_layout.addWidget(self.render_stats_label)
+
         # Espaçador para empurrar os botões para a parte inferior
         right_layout.addStretch()
 
         # Botões Salvar e Fechar
         buttons_layout = QHBoxLayout()
+        self.analyze_button = QPushButton("Analyze")
+        self.analyze_button.clicked.connect(self.analyze_card_type)
         self.save_button = QPushButton("Ok")
         self.save_button.clicked.connect(self.save_changes)
         self.close_button = QPushButton("Close")
         self.close_button.clicked.connect(self.close)
+        buttons_layout.addWidget(self.analyze_button)
         buttons_layout.addWidget(self.save_button)
         buttons_layout.addWidget(self.close_button)
         right_layout.addLayout(buttons_layout)
@@ -82,110 +112,229 @@ class ManageDialog(QDialog):
 
         self.setLayout(main_layout)
 
-        self.save_button.clicked.connect(self.save_card_type_changes)
-
-        # Encontrar os card types com a classe 'clzz'
+        # Encontrar os card types com a classe 'clzz' em segundo plano
         self.find_clzz_card_types()
 
     def find_clzz_card_types(self):
-        """Finds all card types that contain the element <span class="clzz"></span>."""
-        model_manager = mw.col.models
-        self.clzz_card_types = {}
-
-        for model in model_manager.models.values():
-            for tmpl in model['tmpls']:
-                if '<span class="clzz"></span>' in tmpl['qfmt'] or '<span class="clzz"></span>' in tmpl['afmt']:
-                    self.clzz_card_types[model['name']] = model
+        """Finds all card types that contain the element <span class="clzz"></span>.
 
-        # Atualizar o combobox com os nomes dos card types encontrados
-        if self.clzz_card_types:
-            self.card_type_combobox.addItems(self.clzz_card_types.keys())
-        else:
+        The scan runs in a background query; matches are added to the list as they are found.
+        """
+        # Apenas id e nome; o modelo completo só é carregado quando selecionado
+        self.clzz_card_types = {}
+        self._loaded_model = None
+        self.details_textbox.setPlainText("Loading card types...")
+
+        QueryOp(
+            parent=self,
+            op=self.scan_card_types,
+            success=self.on_scan_finished,
+        ).run_in_background()
+
+    def scan_card_types(self, col):
+        """Runs in the background, sending the matches to the list in batches."""
+        batch = []
+        for mid, name in ClzzModelIndex().iter_refresh(col):
+            batch.append((mid, name))
+            if len(batch) >= SCAN_BATCH_SIZE:
+                mw.taskman.run_on_main(lambda found=batch: self.add_card_types(found))
+                batch = []
+        return batch
+
+    def add_card_types(self, found):
+        """Adds the found card types to the list."""
+        for mid, name in found:
+            self.clzz_card_types[name] = mid
+            item = QListWidgetItem(name)
+            item.setData(Qt.ItemDataRole.UserRole, mid)
+            self.card_type_list.addItem(item)
+
+    def on_scan_finished(self, remaining):
+        """Adds the last batch and leaves the loading state."""
+        self.add_card_types(remaining)
+        if not self.clzz_card_types:
             self.details_textbox.setPlainText("No card type found.")
-            self.card_type_combobox.setDisabled(True)
+            self.card_type_list.setDisabled(True)
+        elif not self.card_type_list.selectedItems():
+            self.details_textbox.setPlainText("Select a card type.")
+
+    def selected_model_ids(self):
+        """Returns the ids of all selected card types."""
+        return [item.data(Qt.ItemDataRole.UserRole) for item in self.card_type_list.selectedItems()]
+
+    def selected_model(self):
+        """Returns the full model dict of the current card type, loading it on demand."""
+        item = self.card_type_list.currentItem()
+        if item is None:
+            return None
+        mid = item.data(Qt.ItemDataRole.UserRole)
+        if self._loaded_model is None or self._loaded_model['id'] != mid:
+            self._loaded_model = mw.col.models.get(mid)
+        return self._loaded_model
 
     def show_card_type_details(self):
-        """Shows the details of the selected card type and updates the inputs."""
-        selected_card_type = self.card_type_combobox.currentText()
-        if selected_card_type and selected_card_type in self.clzz_card_types:
-            model = self.clzz_card_types[selected_card_type]
-
+        """Shows the details of the selected card types and updates the inputs."""
+        mids = self.selected_model_ids()
+        if mids:
             # Atualizar os campos de entrada
-            self.update_color_inputs(model)
-            self.update_details_view()
+            models = [mw.col.models.get(mid) for mid in mids]
+            self.update_color_inputs(models)
+            self.update_disable_animations(models)
+            self.update_template_list()
         else:
             self.details_textbox.setPlainText("Select a valid card type.")
 
+    def update_template_list(self):
+        """Lists the templates of the current card type."""
+        model = self.selected_model()
+        index = self.template_combobox.currentIndex()
+        self.template_combobox.blockSignals(True)
+        self.template_combobox.clear()
+        if model:
+            self.template_combobox.addItems([tmpl['name'] for tmpl in model['tmpls']])
+            # Mantém o template escolhido se o card type ainda o tiver
+            self.template_combobox.setCurrentIndex(min(max(index, 0), len(model['tmpls']) - 1))
+        self.template_combobox.blockSignals(False)
+        self.update_details_view()
+
     def update_details_view(self):
-        """Updates the content view based on the option selected in the view_combobox."""
-        selected_card_type = self.card_type_combobox.currentText()
-        if not selected_card_type or selected_card_type not in self.clzz_card_types:
+        """Updates the content view based on the template and view selected."""
+        model = self.selected_model()
+        if not model:
             self.details_textbox.setPlainText("Select a valid card type.")
             return
 
-        model = self.clzz_card_types[selected_card_type]
         selected_view = self.view_combobox.currentText()
+        if not model['tmpls']:
+            self.details_textbox.setPlainText("This card type has no templates.")
+            return
+        tmpl = model['tmpls'][min(max(self.template_combobox.currentIndex(), 0), len(model['tmpls']) - 1)]
 
         if selected_view == "Front":
-            content = model['tmpls'][0]['qfmt']
+            content = tmpl['qfmt']
         elif selected_view == "Back":
-            content = model['tmpls'][0]['afmt']
+            content = tmpl['afmt']
         elif selected_view == "CSS":
             content = model['css']
         else:
             content = "Invalid view."
 
         self.details_textbox.setPlainText(content)
+        self.update_render_stats(model)
+
+    def update_render_stats(self, model):
+        """Shows the render time percentiles collected for the card type in this session."""
+        percentiles = render_stats.percentiles(model['id'])
+        if not percentiles:
+            self.render_stats_label.setText(
+                "No render timings yet. Create the card type with 'Report render timings' and review some cards."
+            )
+            return
 
-    def update_color_inputs(self, model):
-        """Updates the Deck Colors and Cloze Colors fields."""
-        qfmt = model['tmpls'][0]['qfmt']
-        colors = self.extract_variable(qfmt, 'colors')
-        colorsClz = self.extract_variable(qfmt, 'colorsClz')
-
-        self.deck_colors_input.setText(', '.join(colors) if colors else "")
-        self.cloze_colors_input.setText(', '.join(colorsClz) if colorsClz else "")
-
-    def extract_variable(self, content, variable_name):
-        """Extract values ​​from an array in a template script."""
-        pattern = rf"var {variable_name} = \[(.*?)\];"
-        match = re.search(pattern, content, re.DOTALL)
-        if match:
-            # Remover espaços extras e dividir valores
-            values = match.group(1).split(',')
-            return [value.strip().strip("'\"") for value in values]
-        return []
+        lines = [f"Render timings ({render_stats.count(model['id'])} cards):"]
+        for metric in sorted(percentiles):
+            values = percentiles[metric]
+            unit = "" if metric in ("timers", "listeners") else " ms"
+            lines.append(f"{metric}: " + ", ".join(
+                f"p{percent} {value:.1f}{unit}" for percent, value in values.items()
+            ))
+        self.render_stats_label.setText("\n".join(lines))
+
+    def update_color_inputs(self, models):
+        """Updates the Deck Colors and Cloze Colors fields from every template of the models.
+
+        When the templates or the selected card types use different palettes the field is
+        left empty, and an empty field keeps each template's own palette on save.
+        """
+        variables = [model_vars(model) for model in models]
+        for variable_name, line_edit in (("colors", self.deck_colors_input), ("colorsClz", self.cloze_colors_input)):
+            values = [model_variables.get(variable_name, []) for model_variables in variables]
+            if values and None not in values and all(value == values[0] for value in values):
+                line_edit.setText(', '.join(values[0]))
+                line_edit.setPlaceholderText("")
+            else:
+                line_edit.setText("")
+                line_edit.setPlaceholderText("Multiple values")
+
+    def analyze_card_type(self):
+        """Shows the static render cost of the current card type."""
+        model = self.selected_model()
+        if not model:
+            showInfo("No card type selected.")
+            return
+        report = analyze_model(model, get_store().cost_budget())
+        showText(format_report(report), parent=self, title=f"Render cost: {model['name']}")
+
+    def update_disable_animations(self, models):
+        """Shows whether the selected card types have animations disabled.
+
+        Card types created before their settings were stored cannot change features.
+        """
+        states = set(
+            bool(model['clzz'].get("disable_animations")) for model in models if model.get('clzz')
+        )
+        self.disable_animations_checkbox.setEnabled(bool(states))
+        self.disable_animations_checkbox.setToolTip(
+            "" if states else "Create the card type again to change its features."
+        )
+        if len(states) > 1:
+            self.disable_animations_checkbox.setTristate(True)
+            self.disable_animations_checkbox.setCheckState(Qt.CheckState.PartiallyChecked)
+        else:
+            self.disable_animations_checkbox.setTristate(False)
+            self.disable_animations_checkbox.setChecked(states.pop() if states else False)
 
     def save_card_type_changes(self):
-        """Saves the color values ​​in the Front and Back fields of the selected card type."""
-        selected_card_type = self.card_type_combobox.currentText()
-        if not selected_card_type:
+        """Saves the palettes and features of every selected card type."""
+        mids = self.selected_model_ids()
+        if not mids:
             showInfo("No card type selected.")
             return
 
-        # Obtenha os valores dos inputs
-        colorsHTML = self.deck_colors_input.text().strip()
-        colorsClzHTML = self.cloze_colors_input.text().strip()
-
-        # Formate os elementos HTML
-        colorsEl = f'<script> var colors = [{colorsHTML}]; </script>'
-        colorsClzEl = f'<script> var colorsClz = [{colorsClzHTML}]; </script>'
-
-        # Obtenha o modelo do card type selecionado
-        model_manager = mw.col.models
-        model = model_manager.byName(selected_card_type)
-        if not model:
-            showInfo("Error locating the template for the selected card type.")
+        # Obtenha os valores dos inputs; campos vazios mantêm a paleta de cada card type
+        variables = {}
+        for variable_name, line_edit in (("colors", self.deck_colors_input), ("colorsClz", self.cloze_colors_input)):
+            if line_edit.text().strip():
+                variables[variable_name] = parse_palette(line_edit.text())
+
+        disable_animations = None
+        if self.disable_animations_checkbox.checkState() != Qt.CheckState.PartiallyChecked:
+            disable_animations = self.disable_animations_checkbox.isChecked()
+
+        # Verificação de custo de render antes de gravar; card types cujo resultado
+        # seria idêntico não são gravados (nem marcados para sincronizar)
+        warnings = []
+        changed = []
+        for mid in mids:
+            model = mw.col.models.get(mid)
+            if model:
+                patched = copy.deepcopy(model)
+                apply_card_type_changes(patched, variables, disable_animations)
+                if model_digest(patched) != model_digest(model):
+                    changed.append(mid)
+                    warnings += analyze_model(patched, get_store().cost_budget())["warnings"]
+        if not changed:
+            tooltip("No changes to save.", parent=self)
+            return
+        if warnings and not askUser(
+            "Over budget:\n" + "\n".join(warnings) + "\n\nSave anyway?", parent=self
+        ):
             return
 
-        # Atualize o Front e o Back
-        for tmpl in model['tmpls']:
-            tmpl['qfmt'] = colorsEl + colorsClzEl + tmpl['qfmt']
-            tmpl['afmt'] = colorsEl + colorsClzEl + tmpl['afmt']
+        def op(col):
+            # Todas as alterações numa única entrada de desfazer
+            undo_entry = col.add_custom_undo_entry("Update Clzz Card Types")
+            # Atualize o Front e o Back de todos os templates no lugar
+            update_card_types(col, changed, variables, disable_animations)
+            return col.merge_undo_entries(undo_entry)
+
+        # Grava em segundo plano; a interface é atualizada pelas notificações de mudança
+        CollectionOp(parent=self, op=op).success(self.on_card_types_saved).run_in_background()
 
-        # Salve as mudanças no banco de dados do Anki
-        model_manager.save(model)
-        mw.reset()
+    def on_card_types_saved(self, changes):
+        """Reloads the details of the saved card types."""
+        self._loaded_model = None
+        self.show_card_type_details()
 
     def save_changes(self):
         self.save_card_type_changes()
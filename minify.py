@@ -0,0 +1,184 @@
+import re
+
+# Estágio de minificação dos templates gerados: comentários, indentação e logs de
+# depuração não vão para o note type (são sincronizados e lidos a cada card)
+
+SCRIPT_BLOCK_RE = re.compile(r"(<script\b([^>]*)>)(.*?)(</script>)", re.DOTALL | re.IGNORECASE)
+STYLE_BLOCK_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style>)", re.DOTALL | re.IGNORECASE)
+SCRIPT_TYPE_RE = re.compile(r"""\btype\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+
+# Comentários CSS mantidos: marcadores de região do Clzz e /*! licenças */
+CSS_TOKEN_RE = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/|\s+|[{};,>:]|[^"'/\s{};,>:]+|/)""", re.DOTALL
+)
+CSS_KEPT_COMMENT_RE = re.compile(r"/\*(?:/?clzz:\w+|!)")
+CSS_TIGHT = "{};,>"
+
+WORD_CHARS = re.compile(r"[\w$]")
+JS_PUNCT_BEFORE_REGEX = set("(,=:[!&|?{};+-*%<>~^")
+JS_WORDS_BEFORE_REGEX = {"return", "typeof", "case", "do", "else", "in", "of", "void", "delete", "new", "throw"}
+DEBUG_CALLS = {"log", "debug", "info", "trace"}
+
+
+def _js_tokens(js):
+    """Splits JS into (kind, text) tokens: word, string, regex, comment, space, punct."""
+    tokens = []
+    pos = 0
+    length = len(js)
+    last = None  # Último token significativo, para distinguir regex de divisão
+    while pos < length:
+        char = js[pos]
+        start = pos
+        if char.isspace():
+            while pos < length and js[pos].isspace():
+                pos += 1
+            tokens.append(("space", js[start:pos]))
+            continue
+        if WORD_CHARS.match(char):
+            while pos < length and WORD_CHARS.match(js[pos]):
+                pos += 1
+            kind = "word"
+        elif char in "'\"`":
+            pos += 1
+            while pos < length and js[pos] != char:
+                pos += 2 if js[pos] == "\\" else 1
+            pos += 1
+            kind = "string"
+        elif js.startswith("//", pos):
+            end = js.find("\n", pos)
+            pos = length if end < 0 else end
+            kind = "comment"
+        elif js.startswith("/*", pos):
+            end = js.find("*/", pos + 2)
+            pos = length if end < 0 else end + 2
+            kind = "comment"
+        elif char == "/" and (
+            last is None
+            or (last[0] == "punct" and last[1] in JS_PUNCT_BEFORE_REGEX)
+            or (last[0] == "word" and last[1] in JS_WORDS_BEFORE_REGEX)
+        ):
+            pos += 1
+            in_class = False
+            while pos < length and js[pos] != "\n":
+                if js[pos] == "\\":
+                    pos += 1
+                elif js[pos] == "[":
+                    in_class = True
+                elif js[pos] == "]":
+                    in_class = False
+                elif js[pos] == "/" and not in_class:
+                    break
+                pos += 1
+            pos += 1
+            while pos < length and WORD_CHARS.match(js[pos]):
+                pos += 1  # flags
+            kind = "regex"
+        else:
+            pos += 1
+            kind = "punct"
+        token = (kind, js[start:pos])
+        tokens.append(token)
+        if kind != "comment":
+            last = token
+    return tokens
+
+
+def _significant(tokens, index, step):
+    while 0 <= index < len(tokens):
+        if tokens[index][0] not in ("space", "comment"):
+            return index
+        index += step
+    return None
+
+
+def _strip_debug_calls(tokens):
+    """Removes console.log/debug/info/trace(...) calls; inside expressions they become `void 0`."""
+    result = []
+    index = 0
+    while index < len(tokens):
+        kind, text = tokens[index]
+        call = None
+        if kind == "word" and text == "console":
+            dot = _significant(tokens, index + 1, 1)
+            name = dot is not None and _significant(tokens, dot + 1, 1)
+            paren = name and _significant(tokens, name + 1, 1)
+            if (paren and tokens[dot] == ("punct", ".") and tokens[name][1] in DEBUG_CALLS
+                    and tokens[paren] == ("punct", "(")):
+                call = paren
+        if call is None:
+            result.append(tokens[index])
+            index += 1
+            continue
+
+        depth = 0
+        end = call
+        while end < len(tokens):
+            if tokens[end] == ("punct", "("):
+                depth += 1
+            elif tokens[end] == ("punct", ")"):
+                depth -= 1
+                if depth == 0:
+                    break
+            end += 1
+        previous = _significant(result, len(result) - 1, -1)
+        following = _significant(tokens, end + 1, 1)
+        if (previous is None or result[previous][1] in (";", "{", "}")) and (
+                following is not None and tokens[following] == ("punct", ";")):
+            # Instrução isolada: sai inteira, com o ponto e vírgula
+            index = following + 1
+        else:
+            result.extend([("word", "void"), ("space", " "), ("word", "0")])
+            index = end + 1
+    return result
+
+
+def minify_js(js):
+    """Removes comments, indentation and debug logging from JS, keeping line breaks where ASI may need them."""
+    tokens = [token for token in _strip_debug_calls(_js_tokens(js)) if token[0] != "comment"]
+    output = []
+    for index, (kind, text) in enumerate(tokens):
+        if kind != "space":
+            output.append(text)
+            continue
+        if not output or index + 1 >= len(tokens):
+            continue
+        before = output[-1][-1]
+        after = tokens[index + 1][1][0]
+        if "\n" in text:
+            if before not in "{;,([" and after not in ")]};,.":
+                output.append("\n")
+        elif (WORD_CHARS.match(before) and WORD_CHARS.match(after)) or (before in "+-" and after in "+-"):
+            output.append(" ")
+    return "".join(output).strip()
+
+
+def minify_css(css):
+    """Removes comments (except Clzz region markers) and redundant whitespace from CSS."""
+    output = []
+    for token in CSS_TOKEN_RE.findall(css):
+        if token.startswith("/*"):
+            if not CSS_KEPT_COMMENT_RE.match(token):
+                continue
+        elif token.isspace():
+            if output and output[-1][-1] not in CSS_TIGHT + ":":
+                output.append(" ")
+            continue
+        elif token[0] in CSS_TIGHT and output and output[-1] == " ":
+            output.pop()
+        if token == "}" and output and output[-1] == ";":
+            output.pop()
+        output.append(token)
+    return "".join(output).strip()
+
+
+def _minify_script(match):
+    script_type = SCRIPT_TYPE_RE.search(match.group(2))
+    if script_type and "javascript" not in script_type.group(1).lower() and script_type.group(1).lower() != "module":
+        return match.group(0)
+    return match.group(1) + minify_js(match.group(3)) + match.group(4)
+
+
+def minify_html(html):
+    """Minifies the <script> and <style> blocks of a template; the markup itself is kept."""
+    html = SCRIPT_BLOCK_RE.sub(_minify_script, html)
+    return STYLE_BLOCK_RE.sub(lambda m: m.group(1) + minify_css(m.group(2)) + m.group(3), html)
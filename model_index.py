@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+
+CLZZ_MARKER = '<span class="clzz"></span>'
+
+
+def is_clzz_model(model):
+    """Returns True if any template of the model contains the Clzz marker."""
+    for tmpl in model['tmpls']:
+        if CLZZ_MARKER in tmpl['qfmt'] or CLZZ_MARKER in tmpl['afmt']:
+            return True
+    return False
+
+
+def get_index_file():
+    """Returns the path to the persistent Clzz model index."""
+    return os.path.join(os.path.dirname(__file__), "clzz_index.json")
+
+
+class ClzzModelIndex:
+    """Persistent index of the note types that contain the Clzz marker.
+
+    Entries are stored per collection as {model id: [name, mtime, usn, is_clzz]}.
+    A model is only rescanned when its mtime or usn differs from the stored one.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_index_file()
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._data = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._data = {}
+        return self._data
+
+    def _save(self):
+        # Escrita atômica, como SettingsStore._write: roda numa thread do QueryOp
+        fd, tmp_path = tempfile.mkstemp(prefix=".clzz_index-", suffix=".tmp", dir=os.path.dirname(self.path))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _model_stamps(self, col):
+        """Returns {model id: (name, mtime, usn)} without loading the templates when possible."""
+        try:
+            rows = col.db.all("select id, name, mtime_secs, usn from notetypes")
+        except Exception:
+            # Esquema antigo: os modelos ficam num único JSON na tabela col
+            rows = [(m['id'], m['name'], m['mtime'], m['usn']) for m in col.models.all()]
+        return {str(mid): (name, mtime, usn) for mid, name, mtime, usn in rows}
+
+    def iter_refresh(self, col):
+        """Brings the index up to date, yielding (model id, name) of each Clzz model as it is found."""
+        data = self._load()
+        entries = data.get(col.path, {})
+        stamps = self._model_stamps(col)
+        changed = set(entries) != set(stamps)
+
+        updated = {}
+        for mid, (name, mtime, usn) in stamps.items():
+            entry = entries.get(mid)
+            if entry and entry[1] == mtime and entry[2] == usn:
+                updated[mid] = [name, mtime, usn, entry[3]]
+            else:
+                model = col.models.get(int(mid))
+                updated[mid] = [name, mtime, usn, bool(model) and is_clzz_model(model)]
+                changed = True
+            if updated[mid][3]:
+                yield int(mid), name
+
+        if changed:
+            data[col.path] = updated
+            self._save()
+
+    def refresh(self, col):
+        """Brings the index up to date and returns [(model id, name)] of the Clzz models."""
+        return list(self.iter_refresh(col))
@@ -0,0 +1,82 @@
+import html
+import re
+
+from .field_filters import deck_display_name, reveal_clozes
+
+# Tempo sem edições antes de atualizar a pré-visualização
+PREVIEW_DEBOUNCE_MS = 300
+
+# Nota de exemplo mostrada na pré-visualização do ConfigDialog (card da cloze 1)
+SAMPLE_NOTE = {
+    "Text": "The {{c1::mitochondria}} is the <b>powerhouse</b> of the {{c2::cell}}; "
+            "it turns <b>glucose</b> into <strong>ATP</strong> through "
+            "{{c1::cellular respiration::process}}.",
+    "Extra": "Sample extra text.",
+    "Subdeck": "01 Biology",
+}
+
+FIELD_RE = re.compile(r"\{\{([^{}#/^]+?)\}\}")
+CLOZE_RE = re.compile(r"\{\{c(\d+)::(.*?)(?:::(.*?))?\}\}", re.DOTALL)
+
+# Página da pré-visualização: o CSS e o card são trocados no lugar, sem recarregar
+PREVIEW_HTML = """<style id="clzz-preview-css"></style>
+<div id="qa"></div>
+<script>
+document.body.classList.add("card");
+window.clzzPreview = {
+    setCss: function (css) {
+        document.getElementById("clzz-preview-css").textContent = css;
+    },
+    setCard: function (markup) {
+        var qa = document.getElementById("qa");
+        qa.innerHTML = markup;
+        // Scripts inseridos via innerHTML não rodam; recria cada um, em ordem
+        qa.querySelectorAll("script").forEach(old => {
+            var script = document.createElement("script");
+            script.text = old.text;
+            old.replaceWith(script);
+        });
+    },
+};
+</script>"""
+
+
+def render_cloze(text, ordinal, question):
+    """Renders cloze deletions the way Anki does for the card of the given ordinal."""
+
+    def replace(match):
+        number, content, hint = int(match.group(1)), match.group(2), match.group(3)
+        if number != ordinal:
+            return f'<span class="cloze-inactive" data-ordinal="{number}">{content}</span>'
+        if not question:
+            return f'<span class="cloze" data-ordinal="{number}">{content}</span>'
+        return (
+            f'<span class="cloze" data-cloze="{html.escape(content)}" data-ordinal="{number}">'
+            f'[{hint or "..."}]</span>'
+        )
+
+    return CLOZE_RE.sub(replace, text)
+
+
+def render_side(fmt, question, note=None, ordinal=1):
+    """Fills a template with the sample note, applying the filters Clzz templates use."""
+    note = note or SAMPLE_NOTE
+
+    def replace(match):
+        filters = match.group(1).strip().split(":")
+        text = note.get(filters.pop(), "")
+        for name in reversed(filters):
+            if name == "cloze":
+                text = render_cloze(text, ordinal, question)
+            elif name == "clzz":
+                text = reveal_clozes(text)
+            elif name == "clzz-deck":
+                text = deck_display_name(text)
+        return text
+
+    return FIELD_RE.sub(replace, fmt)
+
+
+def preview_settings(settings):
+    """Returns the settings used for the preview: inline runtime, no instrumentation."""
+    return dict(settings, runtime_media=False, instrument=False)
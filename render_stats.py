@@ -0,0 +1,61 @@
+import json
+import math
+from collections import defaultdict, deque
+
+PERF_MESSAGE = "clzz:perf:"
+
+MAX_SAMPLES = 500
+
+
+def percentile(values, percent):
+    """Returns the nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    index = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class RenderStats:
+    """Render timings reported by instrumented Clzz cards, kept per note type."""
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def add(self, mid, payload):
+        """Records one render report for the note type mid."""
+        sample = dict(payload.get("phases", {}))
+        sample["timers"] = payload.get("timers", 0)
+        sample["listeners"] = payload.get("listeners", 0)
+        self._samples[mid].append(sample)
+
+    def count(self, mid):
+        return len(self._samples.get(mid, ()))
+
+    def percentiles(self, mid, percents=(50, 90, 99)):
+        """Returns {metric: {percent: value}} over the samples of a note type."""
+        samples = self._samples.get(mid)
+        if not samples:
+            return {}
+        metrics = {}
+        for sample in samples:
+            for metric, value in sample.items():
+                metrics.setdefault(metric, []).append(value)
+        return dict(
+            (metric, dict((percent, percentile(values, percent)) for percent in percents))
+            for metric, values in metrics.items()
+        )
+
+
+stats = RenderStats()
+
+
+def on_js_message(handled, message, context):
+    """Collects the reports sent by the card webview through pycmd."""
+    if not message.startswith(PERF_MESSAGE):
+        return handled
+    card = getattr(context, "card", None)
+    if card is not None and not callable(card):
+        try:
+            stats.add(card.note_type()['id'], json.loads(message[len(PERF_MESSAGE):]))
+        except ValueError:
+            pass
+    return (True, None)
@@ -0,0 +1,287 @@
+import hashlib
+import re
+
+# O reviewer do Anki reutiliza o mesmo webview para todos os cards. O runtime é
+# instalado uma vez por webview (window.clzz); clzz.begin(), chamado no início de cada
+# render, descarta os listeners, temporizadores e animações do card anterior.
+LIFECYCLE_JS = """
+window.clzz = window.clzz || {};
+if (!clzz.begin) {
+    (function () {
+        var listeners = [];
+        var resets = [];
+        var installed = {};
+
+        clzz.begin = function () {
+            listeners.forEach(l => l.target.removeEventListener(l.type, l.handler, l.options));
+            listeners = [];
+            resets.forEach(reset => reset());
+        };
+
+        // Listener que vive só até o próximo card
+        clzz.on = function (target, type, handler, options) {
+            target.addEventListener(type, handler, options);
+            listeners.push({target: target, type: type, handler: handler, options: options});
+        };
+
+        // Estado do runtime a limpar a cada card
+        clzz.onBegin = function (reset) {
+            resets.push(reset);
+        };
+
+        // Instala algo uma única vez por webview (ex.: atalhos de teclado)
+        clzz.once = function (key, install) {
+            if (!installed[key]) {
+                installed[key] = true;
+                install();
+            }
+        };
+
+        clzz.liveListeners = function () {
+            return listeners.length;
+        };
+    })();
+}
+"""
+
+# Temporizadores do card atual; só entram nos templates com animação, que são os
+# únicos que precisam de setInterval.
+TIMERS_JS = """
+if (!clzz.every) {
+    (function () {
+        var timers = [];
+
+        // Temporizador que vive só até o próximo card
+        clzz.every = function (handler, ms) {
+            var id = setInterval(handler, ms);
+            timers.push(id);
+            return id;
+        };
+
+        clzz.cancel = function (id) {
+            clearInterval(id);
+            timers = timers.filter(timer => timer !== id);
+        };
+
+        clzz.liveTimers = function () {
+            return timers.length;
+        };
+
+        clzz.onBegin(() => {
+            timers.forEach(id => clearInterval(id));
+            timers = [];
+        });
+    })();
+}
+"""
+
+# Um único temporizador anima todos os elementos registrados e pausa enquanto o
+# documento está oculto.
+SCHEDULER_JS = """
+if (!clzz.animate) {
+    (function () {
+        var INTERVAL = 3000;
+        var animated = [];
+        var timer = null;
+
+        function step() {
+            animated = animated.filter(entry => entry.element.isConnected);
+            animated.forEach(entry => {
+                entry.element.style.color = entry.palette[entry.index];
+                entry.index = (entry.index + 1) % entry.palette.length;
+            });
+            if (!animated.length) {
+                stop();
+            }
+        }
+
+        function start() {
+            if (timer === null && animated.length && !document.hidden) {
+                timer = clzz.every(step, INTERVAL);
+            }
+        }
+
+        function stop() {
+            if (timer !== null) {
+                clzz.cancel(timer);
+                timer = null;
+            }
+        }
+
+        clzz.animate = function (element, palette) {
+            if (!element || !palette || !palette.length) {
+                return;
+            }
+            element.style.transition = "color 2s ease-in-out";
+            var entry = animated.find(entry => entry.element === element);
+            if (entry) {
+                entry.palette = palette;
+            } else {
+                animated.push({element: element, palette: palette, index: 0});
+            }
+            start();
+        };
+
+        clzz.onBegin(() => {
+            animated = [];
+            stop();
+        });
+        clzz.once("visibility", () => {
+            document.addEventListener("visibilitychange", () => document.hidden ? stop() : start());
+        });
+    })();
+}
+function animateColor(element, array) {
+    clzz.animate(element, array);
+}
+"""
+
+# Atalho H para mostrar/ocultar as clozes escondidas. Os handlers são criados uma vez
+# por webview e registrados a cada card com clzz.on (HINTS_SETUP_JS), que os remove no
+# card seguinte; uma única troca de classe no <html> revela ou esconde as clozes.
+HINTS_JS = """
+if (!clzz.hints) {
+    (function () {
+        var keyDownHandled = false;
+        clzz.hints = {
+            keydown: (event) => {
+                if (event.key.toLowerCase() === 'h' && !event.repeat && !keyDownHandled) {
+                    keyDownHandled = true;
+                    document.documentElement.classList.toggle('clzz-masked');
+                }
+            },
+            keyup: (event) => {
+                if (event.key.toLowerCase() === 'h') {
+                    keyDownHandled = false; // Permitir próximo disparo
+                }
+            },
+        };
+    })();
+}
+"""
+
+HINTS_SETUP_JS = """clzz.on(document, 'keydown', clzz.hints.keydown);
+clzz.on(document, 'keyup', clzz.hints.keyup);"""
+
+# Modo de instrumentação: marcas performance.mark/measure por fase do render e contagem
+# dos temporizadores e listeners do card registrados no runtime (clzz.every/clzz.on),
+# enviadas ao Python via pycmd ao fim do render.
+INSTRUMENT_JS = """
+window.clzzPerf = window.clzzPerf || (function () {
+    var names = [];
+    var phases = {};
+    var last = null;
+
+    // Só as marcas do Clzz; as do resto da página ficam
+    function clear() {
+        names.forEach(name => {
+            performance.clearMarks(name);
+            performance.clearMeasures(name);
+        });
+        names = [];
+    }
+
+    function begin() {
+        clear();
+        phases = {};
+        performance.mark("clzz:start");
+        names.push("clzz:start");
+        last = "clzz:start";
+    }
+
+    function mark(phase) {
+        performance.mark("clzz:" + phase);
+        names.push("clzz:" + phase);
+        var measure = performance.measure("clzz:" + phase, last, "clzz:" + phase);
+        phases[phase] = measure ? measure.duration : 0;
+        last = "clzz:" + phase;
+    }
+
+    function end() {
+        mark("script");
+        // Dois frames depois do script: o conteúdo já foi pintado
+        requestAnimationFrame(() => requestAnimationFrame(() => {
+            mark("paint");
+            phases.total = performance.measure("clzz:total", "clzz:start", last).duration;
+            names.push("clzz:total");
+            var live = {
+                timers: clzz.liveTimers ? clzz.liveTimers() : 0,
+                listeners: clzz.liveListeners(),
+            };
+            if (typeof pycmd === "function") {
+                pycmd("clzz:perf:" + JSON.stringify({phases: phases, timers: live.timers, listeners: live.listeners}));
+            }
+        }));
+    }
+
+    return {begin: begin, mark: mark, end: end};
+})();
+"""
+
+# Runtime compartilhado gravado uma vez na pasta de mídia da coleção
+RUNTIME_FILE = "_clzz-{}.js"
+RUNTIME_FILE_RE = re.compile(r"_clzz-[0-9a-f]{12}\.js")
+
+
+def runtime_asset(runtime_js):
+    """Returns (filename, content) of the content-hashed media file holding runtime_js."""
+    filename = RUNTIME_FILE.format(hashlib.sha1(runtime_js.encode("utf-8")).hexdigest()[:12])
+    content = runtime_js + f'\n(window.clzzLoaded = window.clzzLoaded || {{}})["{filename}"] = true;\n'
+    return filename, content
+
+
+def bootstrap_js(filename, render_js):
+    """Returns a script that loads the runtime file once per webview, then runs render_js.
+
+    If the file is missing, the card shows a notice instead of silently not rendering.
+    """
+    return f"""<script>(function () {{
+var render = function () {{
+{render_js}
+}};
+if ((window.clzzLoaded || {{}})["{filename}"]) {{
+    render();
+    return;
+}}
+var script = document.createElement("script");
+script.src = "{filename}";
+script.onload = render;
+script.onerror = function () {{
+    // Sem o runtime o card não tem animações nem cores: avisa em vez de falhar calado
+    var notice = document.createElement("div");
+    notice.className = "clzz-missing-runtime";
+    notice.textContent = "Clzz: {filename} is missing from the media folder. Regenerate the card type in Manage Clzz.";
+    document.body.appendChild(notice);
+    console.error(notice.textContent);
+}};
+document.head.appendChild(script);
+}})();</script>"""
+
+
+def write_runtime_asset(col, compiled):
+    """Writes the compiled runtime to the collection media folder, if the templates use one."""
+    if compiled.get("runtime_file"):
+        col.media.write_data(compiled["runtime_file"], compiled["runtime"].encode("utf-8"))
+
+
+def runtime_files(model):
+    """Returns the names of the runtime media files the templates of a model load."""
+    files = set()
+    for tmpl in model['tmpls']:
+        files.update(RUNTIME_FILE_RE.findall(tmpl['qfmt'] + tmpl['afmt']))
+    return files
+
+
+def trash_unused_runtimes(col, filenames):
+    """Moves the given runtime files to the trash unless a note type still loads them.
+
+    The leading underscore keeps Check Media from ever removing them, so runtimes
+    left behind by a regeneration must be cleaned up here.
+    """
+    in_use = set()
+    for model in col.models.all():
+        in_use.update(runtime_files(model))
+    unused = sorted(set(filenames) - in_use)
+    if unused:
+        col.media.trash_files(unused)
+    return unused
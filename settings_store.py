@@ -0,0 +1,202 @@
+import copy
+import json
+import os
+import tempfile
+
+DEFAULT_PRESET = "Default"
+
+DEFAULT_SETTINGS = {
+    "card_type_name": "Clzz Card",
+    "show_decks": True,
+    "show_hints": True,
+    "show_blur": True,
+    "mask_mode": "blur",
+    "use_deck_colors": True,
+    "deck_colors": ["#FF6B6B", "#FFA463", "#FFFF6B", "#63FF91", "#63C4FF"],
+    "use_cloze_colors": True,
+    "cloze_colors": ["#0BBA2E", "#0BBA5D"],
+    "use_custom_front": True,
+    "custom_front": """<script></script>""",
+    "use_custom_back": True,
+    "custom_back": """<script></script>""",
+    "use_custom_css": True,
+    "custom_css": """@font-face {
+  font-family: cheltenham-it;
+  src: url(_cheltenham-italic-700.woff2);
+  font-display: swap;
+}
+
+@font-face {
+  font-family: 'imWriter';
+  src: url(_iAWriter.ttf);
+  font-display: swap;
+}
+
+@font-face {
+  font-family: 'franklin';
+  src: url(_franklin-normal-500.woff2);
+  font-display: swap;
+}
+
+.card {
+    font-family: 'imWriter', 'Yu Gothic Medium', 'Samsung Sans', 'Roboto', sans-serif;
+    font-size: 24px;
+    text-align: center;
+    line-height: 2.4rem;
+    margin: auto 200px;
+}
+
+.cloze {
+    font-weigth: bold;
+}
+
+
+.deck-name {
+    font-family: 'cheltenham-it', 'imperial';
+    font-size: 2rem;
+    font-weight: bold;
+    margin-top: 20px;
+    padding-bottom: 40px;
+}
+
+code {
+    font-family: SF Mono, 'Consolas', 'Fira Sans', courier, monospaced;
+}
+
+#extra {
+    margin-top: 15px
+}
+
+@media screen and (max-width: 400px) {
+    .deck-name {
+        font-size: 1.6rem;
+        margin-top: 10px;
+        padding-bottom: 10px;
+    }
+
+    .card {
+        font-family: 'franklin', 'Yu Gothic Medium', 'Samsung Sans', 'Roboto', sans-serif;
+        font-size: 20px;
+        text-align: center;
+        line-height: 2rem;
+        margin: auto 10px;
+    }
+}
+""",
+    "auto_color_bold": True,
+    "bold_colors_css": False,
+    "disable_animations": False,
+    "runtime_media": False,
+    "instrument": False,
+    "python_filters": False,
+    "readable": False,
+}
+
+
+def get_settings_file():
+    """Returns the path to the user settings file."""
+    return os.path.join(os.path.dirname(__file__), "user_settings.json")
+
+
+class SettingsStore:
+    """Named Clzz settings presets kept in a JSON file.
+
+    The file is parsed once and read again only when its mtime changes. Writes go to a
+    temporary file that then replaces the original, so an interrupted write never
+    leaves a truncated file behind.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_settings_file()
+        self._data = None
+        self._mtime = None
+
+    def _read(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._data is None or mtime != self._mtime:
+            data = {}
+            if mtime is not None:
+                try:
+                    with open(self.path, "r") as f:
+                        data = json.load(f)
+                except ValueError:
+                    data = {}
+            if "presets" not in data:
+                # Formato antigo: um único conjunto de configurações
+                data = {"active": DEFAULT_PRESET, "presets": {DEFAULT_PRESET: data} if data else {}}
+            self._data = data
+            self._mtime = mtime
+        return self._data
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(prefix=".user_settings-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._data = data
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def preset_names(self):
+        """Returns the names of the saved presets, the default one always included."""
+        names = set(self._read()["presets"]) | {DEFAULT_PRESET}
+        return sorted(names)
+
+    def active_name(self):
+        """Returns the name of the preset used last."""
+        return self._read().get("active", DEFAULT_PRESET)
+
+    def get(self, name=None):
+        """Returns the settings of a preset (the active one by default) over the defaults."""
+        data = self._read()
+        settings = copy.deepcopy(DEFAULT_SETTINGS)
+        settings.update(copy.deepcopy(data["presets"].get(name or self.active_name(), {})))
+        return settings
+
+    def save(self, settings, name=None):
+        """Saves settings as a preset (the active one by default) and makes it active."""
+        data = copy.deepcopy(self._read())
+        name = name or data.get("active", DEFAULT_PRESET)
+        data["presets"][name] = settings
+        data["active"] = name
+        self._write(data)
+
+    def cost_budget(self):
+        """Returns the render-cost budget overrides ({metric: limit}) for the analyzer."""
+        return dict(self._read().get("cost_budget", {}))
+
+    def set_active(self, name):
+        """Makes a preset the active one."""
+        data = copy.deepcopy(self._read())
+        if data.get("active") != name:
+            data["active"] = name
+            self._write(data)
+
+    def delete(self, name):
+        """Deletes a preset; the default preset is reset instead."""
+        data = copy.deepcopy(self._read())
+        data["presets"].pop(name, None)
+        if data.get("active") == name:
+            data["active"] = DEFAULT_PRESET
+        self._write(data)
+
+
+_store = None
+
+
+def get_store():
+    """Returns the settings store shared by the whole session."""
+    global _store
+    if _store is None:
+        _store = SettingsStore()
+    return _store
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import re
+
+# Blocos gerados pelo Clzz ficam entre marcadores, para serem substituídos no lugar
+REGION_START = "<!--clzz:{}-->"
+REGION_END = "<!--/clzz:{}-->"
+CSS_REGION_START = "/*clzz:{}*/"
+CSS_REGION_END = "/*/clzz:{}*/"
+
+REGION_NAME_RE = re.compile(r"<!--clzz:(\w+)-->")
+CSS_REGION_NAME_RE = re.compile(r"/\*clzz:(\w+)\*/")
+
+# Blocos <script> var colors = [...]; </script> inseridos por versões antigas
+LEGACY_VARS_RE = re.compile(r"<script>\s*var (?:colors|colorsClz) = \[[^<]*?\];\s*</script>\s*")
+
+# Variáveis de configuração que o Clzz lê e grava nos templates
+CLZZ_VARIABLES = ("colors", "colorsClz")
+
+VAR_DECL_RE = re.compile(r"\bvar\s+(" + "|".join(CLZZ_VARIABLES) + r")\s*=\s*\[")
+
+PARSE_CACHE_SIZE = 256
+
+_region_patterns = {}
+_parse_cache = {}
+
+
+def _markers(css):
+    return (CSS_REGION_START, CSS_REGION_END) if css else (REGION_START, REGION_END)
+
+
+def _region_pattern(name, css=False):
+    key = (name, css)
+    if key not in _region_patterns:
+        start, end = _markers(css)
+        _region_patterns[key] = re.compile(
+            re.escape(start.format(name)) + r"(.*?)" + re.escape(end.format(name)),
+            re.DOTALL,
+        )
+    return _region_patterns[key]
+
+
+def wrap_region(name, body, css=False):
+    """Wraps body in the start/end markers of the named region (CSS comments if css)."""
+    start, end = _markers(css)
+    return start.format(name) + body + end.format(name)
+
+
+def find_region(text, name, css=False):
+    """Returns the body of the named region, or None if it is not present."""
+    match = _region_pattern(name, css).search(text)
+    return match.group(1) if match else None
+
+
+def region_names(text, css=False):
+    """Returns the names of the Clzz regions in text, in order."""
+    return (CSS_REGION_NAME_RE if css else REGION_NAME_RE).findall(text)
+
+
+def remove_region(text, name, css=False):
+    """Removes the named region, markers included."""
+    return _region_pattern(name, css).sub("", text)
+
+
+def sync_regions(text, generated, css=False):
+    """Makes the Clzz regions of text match those of freshly generated output.
+
+    Everything outside the regions (hand edits) is kept. Regions that the generated
+    output no longer has are removed; new ones are inserted right after the region
+    that precedes them in the generated output (at the top if none does), so the
+    regions keep the generated order.
+    """
+    wanted = region_names(generated, css)
+    for name in region_names(text, css):
+        if name not in wanted:
+            text = remove_region(text, name, css)
+    anchor = 0
+    for name in wanted:
+        block = _region_pattern(name, css).search(generated).group(0)
+        match = _region_pattern(name, css).search(text)
+        if match:
+            start, end = match.span()
+        else:
+            start = end = anchor
+        text = text[:start] + block + text[end:]
+        anchor = start + len(block)
+    return text
+
+
+def _parse_array(text, pos):
+    """Tokenizes a JS array literal starting after its '['; returns (values, end position).
+
+    Quoted strings keep their commas, parentheses nest (rgb(1, 2, 3)) and bare
+    values such as #FF6B6B from older templates are accepted as they are.
+    """
+    values = []
+    current = ""
+    quote = None
+    depth = 0
+    while pos < len(text):
+        char = text[pos]
+        if quote:
+            if char == "\\" and pos + 1 < len(text):
+                current += text[pos + 1]
+                pos += 1
+            elif char == quote:
+                quote = None
+            else:
+                current += char
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+            current += char
+        elif char == ")":
+            depth = max(depth - 1, 0)
+            current += char
+        elif char == "," and depth == 0:
+            values.append(current.strip())
+            current = ""
+        elif char == "]" and depth == 0:
+            values.append(current.strip())
+            return [value for value in values if value], pos + 1
+        else:
+            current += char
+        pos += 1
+    raise ValueError("Unterminated array literal")
+
+
+def parse_palette(text):
+    """Splits a comma separated palette, keeping commas inside quotes or parentheses (e.g. rgb())."""
+    try:
+        return _parse_array(text + "]", 0)[0]
+    except ValueError:
+        # Aspas sem fechamento: trata o texto como valores simples
+        return _parse_array(text.replace("'", "").replace('"', "") + "]", 0)[0]
+
+
+def _scan_vars(text, variables):
+    pos = 0
+    while True:
+        match = VAR_DECL_RE.search(text, pos)
+        if not match:
+            break
+        try:
+            values, pos = _parse_array(text, match.end())
+        except ValueError:
+            break
+        variables.setdefault(match.group(1), values)
+
+
+def parse_vars(fmt):
+    """Returns {name: [values]} for every Clzz variable declared in a template.
+
+    The template is scanned once; the vars region written by set_vars wins, and
+    otherwise, when a variable is declared more than once (older templates got a
+    new block prepended on each save), the first declaration wins. Results are
+    memoized by a hash of the template.
+    """
+    key = hashlib.sha1(fmt.encode("utf-8")).hexdigest()
+    if key in _parse_cache:
+        return dict(_parse_cache[key])
+
+    variables = {}
+    region = find_region(fmt, "vars")
+    if region is not None:
+        _scan_vars(region, variables)
+    _scan_vars(fmt, variables)
+
+    if len(_parse_cache) >= PARSE_CACHE_SIZE:
+        _parse_cache.pop(next(iter(_parse_cache)))
+    _parse_cache[key] = variables
+    return dict(variables)
+
+
+def model_vars(model):
+    """Returns {name: [values]} over every template of a model.
+
+    A variable whose value differs between templates (or Front and Back) maps to None.
+    """
+    merged = {}
+    for tmpl in model['tmpls']:
+        for fmt in (tmpl['qfmt'], tmpl['afmt']):
+            for name, values in parse_vars(fmt).items():
+                if name not in merged:
+                    merged[name] = values
+                elif merged[name] != values:
+                    merged[name] = None
+    return merged
+
+
+def vars_block(variables):
+    """Returns the <script> declaring each palette, e.g. {"colors": [...]}."""
+    declarations = " ".join(
+        f"var {name} = {json.dumps(list(values))};" for name, values in variables.items()
+    )
+    return f"<script>{declarations}</script>"
+
+
+def set_vars(fmt, variables):
+    """Updates the Clzz variables of a template in place, dropping legacy blocks.
+
+    The vars region goes where the last legacy block (or the region itself) was, and
+    always after any declaration hard-coded in the template's own scripts (the Back
+    of the original card type declares colorsClz), so it is the one that takes effect.
+    """
+    region = _region_pattern("vars").search(fmt)
+    region_at = None
+    if region:
+        fmt = fmt[:region.start()] + fmt[region.end():]
+        region_at = region.start()
+
+    positions = []
+    kept = ""
+    last = 0
+    for legacy in LEGACY_VARS_RE.finditer(fmt):
+        if region_at is not None and legacy.start() >= region_at >= last:
+            positions.append(len(kept) + region_at - last)
+        kept += fmt[last:legacy.start()]
+        last = legacy.end()
+        positions.append(len(kept))
+    if region_at is not None and region_at >= last:
+        positions.append(len(kept) + region_at - last)
+    fmt = kept + fmt[last:]
+
+    for declaration in VAR_DECL_RE.finditer(fmt):
+        script_end = fmt.find("</script>", declaration.end())
+        positions.append(len(fmt) if script_end < 0 else script_end + len("</script>"))
+
+    position = max(positions) if positions else 0
+    return fmt[:position] + wrap_region("vars", vars_block(variables)) + fmt[position:]
+
+
+def _normalize(text):
+    # Fins de linha e espaços no fim das linhas não mudam o card
+    return "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").split("\n")).strip()
+
+
+def model_digest(model):
+    """Returns a hash of the normalized templates, CSS and Clzz settings of a model."""
+    digest = hashlib.sha1()
+    for tmpl in model['tmpls']:
+        for side in ('qfmt', 'afmt'):
+            digest.update(_normalize(tmpl[side]).encode("utf-8") + b"\0")
+    digest.update(_normalize(model['css']).encode("utf-8") + b"\0")
+    digest.update(json.dumps(model.get('clzz'), sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_template_only_change(old, new):
+    """Returns True if new differs from old in template text and CSS only.
+
+    Adding, removing or renaming fields or templates is a schema change, which
+    forces a full sync; Clzz saves must never do that.
+    """
+    return (
+        [field['name'] for field in old['flds']] == [field['name'] for field in new['flds']]
+        and [(tmpl['name'], tmpl.get('ord')) for tmpl in old['tmpls']]
+        == [(tmpl['name'], tmpl.get('ord')) for tmpl in new['tmpls']]
+        and old.get('type') == new.get('type')
+    )
+
+
+def patch_model_vars(model, variables):
+    """Updates Clzz variables in the Front and Back of every template of the model.
+
+    Variables missing from `variables` keep the value each template already has.
+    """
+    for tmpl in model['tmpls']:
+        for side in ('qfmt', 'afmt'):
+            merged = parse_vars(tmpl[side])
+            merged.update(variables)
+            tmpl[side] = set_vars(tmpl[side], merged)
+    return model
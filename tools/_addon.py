@@ -0,0 +1,28 @@
+"""Makes the add-on's pure modules importable outside Anki.
+
+The add-on folder is registered as the package ``clzz`` without running its
+``__init__.py``, which needs a running Anki main window.
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_addon(name="clzz"):
+    """Registers the add-on folder as package ``name`` and returns it."""
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            name, os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT]
+        )
+        sys.modules[name] = importlib.util.module_from_spec(spec)
+    return sys.modules[name]
+
+
+def addon_module(module_name, name="clzz"):
+    """Imports one of the add-on's pure modules, e.g. addon_module("template_patch")."""
+    load_addon(name)
+    return importlib.import_module(f"{name}.{module_name}")
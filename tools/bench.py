@@ -0,0 +1,243 @@
+"""Headless benchmark suite for Clzz template generation and model discovery.
+
+Runs against a stub collection (col.models / col.db) filled with synthetic note
+types, so no running Anki is needed, and prints the results as JSON:
+
+  compile   -- compile_templates (the generation behind ConfigDialog.create_card_type)
+               for combinations of the feature checkboxes and mask modes (a seeded
+               sample by default, --combinations 0 for all), with template sizes
+  discover  -- ClzzModelIndex refresh (behind ManageDialog.find_clzz_card_types),
+               cold and warm, for collections of 10, 1k and 10k models
+  save      -- repeated card_types.update_card_types calls, the regenerate-and-save
+               behind ManageDialog.save_card_type_changes
+
+    python tools/bench.py > bench.json
+    python tools/bench.py --sizes 10 1000 --saves 50 --combinations 0
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from _addon import addon_module
+
+card_types = addon_module("card_types")
+compiler = addon_module("compiler")
+model_index = addon_module("model_index")
+settings_store = addon_module("settings_store")
+
+# Checkboxes of the ConfigDialog, as keys of the settings dict
+FEATURE_FLAGS = (
+    "show_decks",
+    "show_hints",
+    "show_blur",
+    "use_deck_colors",
+    "use_cloze_colors",
+    "auto_color_bold",
+    "use_custom_front",
+    "use_custom_back",
+    "use_custom_css",
+    "runtime_media",
+    "disable_animations",
+    "bold_colors_css",
+    "python_filters",
+    "instrument",
+    "readable",
+)
+
+# Choices of the "Cloze mask" combobox; only matter with show_blur on
+MASK_MODES = ("blur", "shadow", "bars")
+
+CLOZE_FIELDS = [{'name': "Text", 'ord': 0}, {'name': "Extra", 'ord': 1}]
+PLAIN_TEMPLATE = "<div class='front'>{{Front}}</div>\n" + "<p>{{Back}}</p>\n" * 100
+
+
+class StubDB:
+    def __init__(self, models):
+        self._models = models
+
+    def all(self, sql):
+        return [(m['id'], m['name'], m['mtime'], m['usn']) for m in self._models.values()]
+
+
+class StubModels:
+    """The parts of anki.models.ModelManager used by Clzz."""
+
+    def __init__(self):
+        self.models = {}
+        self._next_id = 1
+
+    def get(self, mid):
+        model = self.models.get(mid)
+        return copy.deepcopy(model) if model else None
+
+    def all(self):
+        return list(self.models.values())
+
+    def add(self, name, tmpls, css="", **extra):
+        model = dict({'id': self._next_id, 'name': name, 'mtime': 1, 'usn': 0, 'tmpls': tmpls, 'css': css}, **extra)
+        self.models[model['id']] = model
+        self._next_id += 1
+        return model
+
+    def update_dict(self, model):
+        model = copy.deepcopy(model)
+        model['mtime'] += 1
+        model['usn'] = -1
+        self.models[model['id']] = model
+
+
+class StubMedia:
+    def __init__(self):
+        self.files = {}
+
+    def write_data(self, name, data):
+        self.files[name] = data
+        return name
+
+    def trash_files(self, names):
+        for name in names:
+            self.files.pop(name, None)
+
+
+class StubCollection:
+    def __init__(self, path):
+        self.path = path
+        self.models = StubModels()
+        self.media = StubMedia()
+        self.db = StubDB(self.models.models)
+
+
+def synthetic_collection(size, clzz_ratio, settings):
+    """Returns a stub collection with `size` models, a share of them Clzz note types."""
+    col = StubCollection(f"/synthetic/{size}.anki2")
+    compiled = compiler.compile_templates(settings)
+    clzz_every = max(int(round(1 / clzz_ratio)), 1) if clzz_ratio else 0
+    for n in range(size):
+        if clzz_every and n % clzz_every == 0:
+            tmpls = [{'name': "Cloze", 'ord': 0, 'qfmt': compiled['qfmt'], 'afmt': compiled['afmt']}]
+            col.models.add(f"Clzz {n}", tmpls, compiled['css'], flds=CLOZE_FIELDS, type=1,
+                           clzz=copy.deepcopy(settings))
+        else:
+            tmpls = [{'name': "Card 1", 'qfmt': PLAIN_TEMPLATE, 'afmt': PLAIN_TEMPLATE}]
+            col.models.add(f"Basic {n}", tmpls, flds=[{'name': "Front", 'ord': 0}], type=0)
+    return col
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def feature_combinations(base_settings, limit=None, seed=0):
+    """Returns settings for the combinations of FEATURE_FLAGS and MASK_MODES, or a seeded sample of limit of them."""
+    combinations = [
+        (flags, mask_mode)
+        for flags in itertools.product((False, True), repeat=len(FEATURE_FLAGS))
+        for mask_mode in (MASK_MODES if flags[FEATURE_FLAGS.index("show_blur")] else MASK_MODES[:1])
+    ]
+    if limit and limit < len(combinations):
+        # 15 flags e 3 máscaras dão ~50k combinações: amostra fixa para caber em segundos
+        combinations = sorted(random.Random(seed).sample(combinations, limit))
+    return [dict(base_settings, mask_mode=mask_mode, **dict(zip(FEATURE_FLAGS, flags)))
+            for flags, mask_mode in combinations]
+
+
+def bench_compile(base_settings, repeat, limit=None):
+    results = []
+    for settings in feature_combinations(base_settings, limit):
+        cold = []
+        for _ in range(repeat):
+            compiler._cache.clear()
+            cold.append(timed(compiler.compile_templates, settings)[0])
+        warm_ms, compiled = timed(compiler.compile_templates, settings)
+        results.append({
+            "flags": dict((flag, settings[flag]) for flag in FEATURE_FLAGS),
+            "mask_mode": settings["mask_mode"],
+            "features": compiled["features"],
+            "cold_ms": statistics.median(cold),
+            "warm_ms": warm_ms,
+            "qfmt_bytes": len(compiled["qfmt"].encode("utf-8")),
+            "afmt_bytes": len(compiled["afmt"].encode("utf-8")),
+            "css_bytes": len(compiled["css"].encode("utf-8")),
+            "runtime_bytes": len(compiled["runtime"].encode("utf-8")),
+            "source_bytes": dict((key, size[0]) for key, size in compiled["sizes"].items()),
+        })
+    return results
+
+
+def bench_discover(sizes, clzz_ratio, settings):
+    results = []
+    for size in sizes:
+        col = synthetic_collection(size, clzz_ratio, settings)
+        with tempfile.TemporaryDirectory() as directory:
+            index = model_index.ClzzModelIndex(os.path.join(directory, "clzz_index.json"))
+            cold_ms, found = timed(index.refresh, col)
+            warm_ms, _ = timed(index.refresh, col)
+            # Um modelo alterado: só ele é lido de novo
+            col.models.update_dict(col.models.get(1))
+            one_changed_ms, _ = timed(index.refresh, col)
+            fresh_ms, _ = timed(model_index.ClzzModelIndex(index.path).refresh, col)
+        results.append({
+            "models": size,
+            "clzz_models": len(found),
+            "cold_ms": cold_ms,
+            "warm_ms": warm_ms,
+            "one_changed_ms": one_changed_ms,
+            "new_session_ms": fresh_ms,
+        })
+    return results
+
+
+def bench_save(saves, settings):
+    col = synthetic_collection(1, 1, settings)
+    model = col.models.get(1)
+    palettes = settings["deck_colors"]
+    samples = []
+    saved_count = 0
+    for n in range(1, saves + 1):
+        variables = {"colors": palettes[n % len(palettes):] + palettes[:n % len(palettes)]}
+        # Sem cache: cada save regenera os templates como na primeira vez
+        compiler._cache.clear()
+        save_ms, saved_ids = timed(card_types.update_card_types, col, [model['id']], variables)
+        samples.append(save_ms)
+        saved_count += len(saved_ids)
+    saved = col.models.get(model['id'])
+    return {
+        "saves": saves,
+        "saved": saved_count,
+        "median_ms": statistics.median(samples),
+        "max_ms": max(samples),
+        "qfmt_bytes_before": len(model['tmpls'][0]['qfmt'].encode("utf-8")),
+        "qfmt_bytes_after": len(saved['tmpls'][0]['qfmt'].encode("utf-8")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--clzz-ratio", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--saves", type=int, default=100)
+    parser.add_argument("--combinations", type=int, default=256,
+                        help="feature combinations to compile (0 for all of them)")
+    args = parser.parse_args()
+
+    settings = settings_store.DEFAULT_SETTINGS
+    results = {
+        "compile": bench_compile(settings, args.repeat, args.combinations),
+        "discover": bench_discover(args.sizes, args.clzz_ratio, settings),
+        "save": bench_save(args.saves, settings),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
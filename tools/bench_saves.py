@@ -0,0 +1,122 @@
+"""Regression benchmark for repeated saves in the Manage Clzz dialog.
+
+Applies N palette saves to a Clzz template, once with the old behaviour
+(prepending new variable blocks) and once with template_patch.patch_model_vars,
+and prints template size, <script> count, the cost of evaluating the template's
+variable blocks and whether the saved palette is the one the card ends up using
+after each save as JSON. Besides a minimal body, the Back template of the original
+create_card_type is used: it declares colorsClz itself, before the palette blocks.
+
+    python tools/bench_saves.py --saves 200
+"""
+
+import argparse
+import json
+import re
+import time
+
+from _addon import addon_module
+
+template_patch = addon_module("template_patch")
+
+SCRIPT_RE = re.compile(r"<script>(.*?)</script>", re.DOTALL)
+VAR_RE = re.compile(r"var (\w+) = (\[.*?\]);")
+
+BODY = """<script>
+    var elements = document.querySelectorAll('.cloze');
+</script><span class="clzz"></span><div class="deck-name">{{Subdeck}}</div>{{cloze:Text}}"""
+
+# Back do create_card_type original, com as paletas escolhidas na criação no fim
+ORIGINAL_BACK = """<script>
+    var boldElements = document.querySelectorAll("b, strong");
+    var elements = document.querySelectorAll('.cloze');
+    var keyDownHandled = false;
+    
+    var other = ["#FF6B6B", "#FFA463", "#FFFF6B"];
+    var colorsClz = ["#0bba2e", "#0bba5d", "#0bba5d", "#0bba5d"]; 
+    function animateColor(element, array) {
+        let colorIndex = 0;
+        element.style.transition = "color 2s ease-in-out";
+        setInterval(() => {
+            element.style.color = array[colorIndex]; // Aplica a cor
+            colorIndex = (colorIndex + 1) % array.length; // Alterna as cores
+        }, 3000); // Muda a cor a cada 1 segundo (1000 ms)
+    }</script>
+            <script> var colors = [#FF6B6B, #FFA463]; </script><script> var colorsClz = [#0BBA2E, #0BBA5D]; </script><script>
+    elements.forEach(function(element) {
+        animateColor(element, colorsClz);
+    });
+</script>"""
+
+
+def legacy_save(model, colors, colors_clz):
+    colorsEl = f'<script> var colors = [{colors}]; </script>'
+    colorsClzEl = f'<script> var colorsClz = [{colors_clz}]; </script>'
+    for tmpl in model['tmpls']:
+        tmpl['qfmt'] = colorsEl + colorsClzEl + tmpl['qfmt']
+        tmpl['afmt'] = colorsEl + colorsClzEl + tmpl['afmt']
+
+
+def patched_save(model, colors, colors_clz):
+    template_patch.patch_model_vars(model, {
+        "colors": template_patch.parse_palette(colors),
+        "colorsClz": template_patch.parse_palette(colors_clz),
+    })
+
+
+def render_cost(fmt):
+    """Stands in for the webview: parses every script block and evaluates its var arrays."""
+    started = time.perf_counter()
+    for script in SCRIPT_RE.findall(fmt):
+        for _name, values in VAR_RE.findall(script):
+            template_patch.parse_palette(values.strip("[]"))
+    return time.perf_counter() - started
+
+
+def effective_vars(fmt):
+    """Returns the value each variable has once every script ran: the last declaration wins."""
+    variables = {}
+    for script in SCRIPT_RE.findall(fmt):
+        for name, values in VAR_RE.findall(script):
+            variables[name] = template_patch.parse_palette(values.strip("[]"))
+    return variables
+
+
+def run(save, saves, sample_every, body=BODY):
+    model = {'tmpls': [{'qfmt': body, 'afmt': body}]}
+    samples = []
+    for n in range(1, saves + 1):
+        palette = f"#{n % 256:02x}6B6B, #FFA463, rgb(1, 2, 3)"
+        colors_clz = f"#0BBA{n % 256:02x}, #0BBA5D"
+        save(model, palette, colors_clz)
+        if n == 1 or n % sample_every == 0:
+            qfmt = model['tmpls'][0]['qfmt']
+            applied = effective_vars(qfmt)
+            samples.append({
+                "saves": n,
+                "bytes": len(qfmt.encode("utf-8")),
+                "scripts": qfmt.count("<script>"),
+                "render_ms": render_cost(qfmt) * 1000,
+                "palette_applied": applied.get("colors") == template_patch.parse_palette(palette)
+                and applied.get("colorsClz") == template_patch.parse_palette(colors_clz),
+            })
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--saves", type=int, default=100)
+    parser.add_argument("--sample-every", type=int, default=10)
+    args = parser.parse_args()
+
+    results = {
+        "legacy": run(legacy_save, args.saves, args.sample_every),
+        "patched": run(patched_save, args.saves, args.sample_every),
+        "legacy_original_back": run(legacy_save, args.saves, args.sample_every, ORIGINAL_BACK),
+        "patched_original_back": run(patched_save, args.saves, args.sample_every, ORIGINAL_BACK),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
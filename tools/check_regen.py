@@ -0,0 +1,93 @@
+"""Checks that regenerating a Clzz note type gives the same output as creating it.
+
+For settings s1 and s2, a model compiled from s1 and then passed through
+apply_to_model(model, s2) (as the Manage dialog and tools/stamp.py do) must have
+exactly the templates and CSS of compile_templates(s2), and hand edits around the
+generated regions must survive. Combinations of the feature checkboxes and mask
+modes (the same sample as tools/bench.py) are checked against the defaults in both
+directions, plus random pairs:
+
+    python tools/check_regen.py
+    python tools/check_regen.py --combinations 0 --pairs 2000 --seed 7
+"""
+
+import argparse
+import copy
+import json
+import random
+import sys
+
+from _addon import addon_module
+from bench import FEATURE_FLAGS, feature_combinations
+
+compiler = addon_module("compiler")
+settings_store = addon_module("settings_store")
+
+HAND_EDIT_START = "<!--mine-->"
+HAND_EDIT_END = "<div class='mine'></div>"
+
+
+def model_from(settings):
+    compiled = compiler.compile_templates(settings)
+    return {
+        'name': "Clzz",
+        'tmpls': [{'name': "Cloze", 'qfmt': compiled['qfmt'], 'afmt': compiled['afmt']}],
+        'css': compiled['css'],
+        'clzz': settings,
+    }
+
+
+def check(s1, s2):
+    """Returns the mismatches of regenerating a model made from s1 with s2."""
+    expected = compiler.compile_templates(s2)
+    problems = []
+
+    model = model_from(s1)
+    compiler.apply_to_model(model, s2)
+    for key, value in (("qfmt", model['tmpls'][0]['qfmt']), ("afmt", model['tmpls'][0]['afmt']),
+                       ("css", model['css'])):
+        if value != expected[key]:
+            problems.append(key)
+
+    # Edições fora das regiões continuam no lugar
+    model = model_from(s1)
+    tmpl = model['tmpls'][0]
+    tmpl['qfmt'] = HAND_EDIT_START + tmpl['qfmt'] + HAND_EDIT_END
+    compiler.apply_to_model(model, s2)
+    if tmpl['qfmt'] != HAND_EDIT_START + expected['qfmt'] + HAND_EDIT_END:
+        problems.append("hand edits")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=500, help="random settings pairs to check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--combinations", type=int, default=256,
+                        help="feature combinations to check against the defaults (0 for all of them)")
+    args = parser.parse_args()
+
+    base = copy.deepcopy(settings_store.DEFAULT_SETTINGS)
+    everything = feature_combinations(base, args.combinations, args.seed)
+    pairs = []
+    for settings in everything:
+        pairs.append((base, settings))
+        pairs.append((settings, base))
+    rng = random.Random(args.seed)
+    pairs.extend((rng.choice(everything), rng.choice(everything)) for _ in range(args.pairs))
+
+    failures = []
+    for s1, s2 in pairs:
+        problems = check(s1, s2)
+        if problems:
+            failures.append({
+                "from": dict((flag, s1[flag]) for flag in FEATURE_FLAGS + ("mask_mode",)),
+                "to": dict((flag, s2[flag]) for flag in FEATURE_FLAGS + ("mask_mode",)),
+                "mismatches": problems,
+            })
+    print(json.dumps({"checked": len(pairs), "failures": failures[:20], "failed": len(failures)}, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Creates or regenerates a Clzz note type in many Anki collections at once.
+
+Each collection is opened offline with the ``anki`` package (close Anki, or at
+least the profiles involved, first) and gets the note type described by a
+settings preset: created if missing, regenerated in place if it already exists.
+Collections are processed in parallel, one per worker process.
+
+    python tools/stamp.py profiles/*/collection.anki2
+    python tools/stamp.py --preset Students --workers 4 a.anki2 b.anki2
+    python tools/stamp.py --settings my_settings.json --json shared.anki2
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from _addon import addon_module
+
+card_types = addon_module("card_types")
+settings_store = addon_module("settings_store")
+
+
+def load_settings(preset=None, path=None):
+    """Returns the settings of a saved preset, or of a JSON file, over the defaults."""
+    if path:
+        with open(path, "r") as f:
+            return dict(settings_store.DEFAULT_SETTINGS, **json.load(f))
+    store = settings_store.SettingsStore()
+    if preset and preset not in store.preset_names():
+        raise SystemExit(f"Unknown preset '{preset}'; saved presets: {', '.join(store.preset_names())}")
+    return store.get(preset)
+
+
+def stamp_collection(path, settings):
+    """Applies settings to one collection; runs in a worker process."""
+    from anki.collection import Collection
+
+    started = time.perf_counter()
+    try:
+        col = Collection(path)
+        try:
+            result = card_types.stamp_card_type(col, settings)
+        finally:
+            col.close()
+        return {"collection": path, "result": result, "ms": (time.perf_counter() - started) * 1000}
+    except Exception as e:
+        return {"collection": path, "error": str(e), "ms": (time.perf_counter() - started) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("collections", nargs="+", help=".anki2 collection files")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--preset", help="saved preset name (default: the active preset)")
+    source.add_argument("--settings", help="JSON file with the settings to apply")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    settings = load_settings(args.preset, args.settings)
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(stamp_collection, path, settings) for path in args.collections]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if not args.json:
+                outcome = result.get("result") or f"error: {result['error']}"
+                print(f"{result['collection']}: {outcome} ({result['ms']:.0f} ms)", flush=True)
+
+    total_ms = (time.perf_counter() - started) * 1000
+    if args.json:
+        print(json.dumps({"card_type_name": settings["card_type_name"], "total_ms": total_ms,
+                          "collections": results}, indent=2))
+    else:
+        print(f"{len(results)} collections in {total_ms:.0f} ms")
+    return 1 if any("error" in result for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Subsets the fonts of the Clzz note types to the characters their notes use.
+
+Opens a collection offline with the ``anki`` package (close Anki first), collects
+the text of every note of the Clzz note types (plus deck names, template text,
+printable ASCII and the Latin-1 and Latin Extended-A letters, so new notes still
+render), and writes a WOFF2 subset of each local font referenced by their
+@font-face rules to the media folder. The rules are then pointed at the subsets
+and given a font-display hint; the original fonts are kept, so the tool can be run
+again after adding notes, and subsets whose bytes did not change are left alone.
+Everything runs locally.
+
+Needs fontTools with WOFF2 support:
+
+    pip install fonttools brotli
+    python tools/subset_fonts.py ~/.local/share/Anki2/User\\ 1/collection.anki2
+    python tools/subset_fonts.py --dry-run --font-display optional collection.anki2
+"""
+
+import argparse
+import copy
+import html
+import io
+import json
+import os
+import re
+import string
+import sys
+import time
+
+from _addon import addon_module
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    subset = None
+
+card_types = addon_module("card_types")
+model_index = addon_module("model_index")
+
+FONT_FACE_RE = re.compile(r"(@font-face\s*\{)([^}]*)(\})", re.IGNORECASE)
+URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""", re.IGNORECASE)
+FONT_DISPLAY_RE = re.compile(r"font-display\s*:", re.IGNORECASE)
+TAG_RE = re.compile(r"<[^>]+>")
+
+FONT_EXTENSIONS = (".ttf", ".otf", ".woff", ".woff2")
+SUBSET_SUFFIX = "-subset"
+
+# Sempre incluídos: ASCII imprimível, Latin-1 Supplement e Latin Extended-A
+# (acentos do português, espanhol, francês, alemão...) e o texto que o próprio Clzz escreve
+BASE_TEXT = string.printable + "".join(chr(code) for code in range(0xA0, 0x180)) + "[...]"
+
+
+def is_local(url):
+    return not re.match(r"^[a-z][a-z0-9+.-]*:", url, re.IGNORECASE) and "/" not in url
+
+
+def original_font(name, media_dir):
+    """Returns the media file a font URL was subset from (or the URL itself)."""
+    stem = os.path.splitext(name)[0]
+    if not stem.endswith(SUBSET_SUFFIX):
+        return name
+    stem = stem[:-len(SUBSET_SUFFIX)]
+    for candidate in (stem + ext for ext in FONT_EXTENSIONS):
+        if os.path.exists(os.path.join(media_dir, candidate)):
+            return candidate
+    return name
+
+
+def font_urls(css):
+    """Returns the local font files referenced by the @font-face rules of css."""
+    urls = []
+    for _start, body, _end in FONT_FACE_RE.findall(css):
+        urls.extend(url for _quote, url in URL_RE.findall(body) if is_local(url) and url not in urls)
+    return urls
+
+
+def rewrite_font_faces(css, replacements, font_display):
+    """Points the @font-face URLs at their subsets and adds font-display where it is missing."""
+
+    def rewrite(match):
+        body = URL_RE.sub(
+            lambda url: f"url({url.group(1)}{replacements.get(url.group(2), url.group(2))}{url.group(1)})",
+            match.group(2),
+        )
+        if font_display and not FONT_DISPLAY_RE.search(body):
+            # Respeita o estilo do CSS: legível (uma declaração por linha) ou minificado
+            if "\n" in body:
+                body = body.rstrip() + f"\n  font-display: {font_display};\n"
+            else:
+                body = body.rstrip().rstrip(";") + f";font-display:{font_display}"
+        return match.group(1) + body + match.group(3)
+
+    return FONT_FACE_RE.sub(rewrite, css)
+
+
+def clzz_models(col):
+    return [model for model in col.models.all() if model_index.is_clzz_model(model)]
+
+
+def collect_text(col, models):
+    """Returns the set of characters shown by the cards of the given note types."""
+    chars = set(BASE_TEXT)
+    for model in models:
+        for tmpl in model['tmpls']:
+            chars.update(html.unescape(TAG_RE.sub("", tmpl['qfmt'] + tmpl['afmt'])))
+        for nid in col.find_notes(f"mid:{model['id']}"):
+            for field in col.get_note(nid).fields:
+                chars.update(html.unescape(TAG_RE.sub("", field)))
+    for deck in col.decks.all_names_and_ids():
+        chars.update(deck.name)
+    chars.discard("\n")
+    return "".join(sorted(chars))
+
+
+def subset_font(path, text):
+    """Returns the WOFF2 bytes of the font at path reduced to the glyphs of text."""
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    # Sem recalcular head.modified, para o mesmo texto dar os mesmos bytes
+    font = TTFont(path, recalcTimestamp=False)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    output = io.BytesIO()
+    font.flavor = "woff2"
+    font.save(output)
+    return output.getvalue()
+
+
+def unchanged_file(path, data):
+    if not os.path.exists(path) or os.path.getsize(path) != len(data):
+        return False
+    with open(path, "rb") as f:
+        return f.read() == data
+
+
+def subset_collection(col, font_display, dry_run=False):
+    """Subsets the fonts of the Clzz note types of one collection; returns a report dict."""
+    media_dir = col.media.dir()
+    models = clzz_models(col)
+    text = collect_text(col, models)
+
+    fonts = {}
+    for model in models:
+        for url in font_urls(model['css']):
+            fonts.setdefault(url, original_font(url, media_dir))
+
+    report = {"models": [model['name'] for model in models], "characters": len(text), "fonts": []}
+    replacements = {}
+    for url, source in fonts.items():
+        path = os.path.join(media_dir, source)
+        if not os.path.exists(path):
+            report["fonts"].append({"font": source, "error": "not in the media folder"})
+            continue
+        started = time.perf_counter()
+        data = subset_font(path, text)
+        entry = {
+            "font": source,
+            "bytes": os.path.getsize(path),
+            "subset_bytes": len(data),
+            "ms": (time.perf_counter() - started) * 1000,
+        }
+        if not dry_run and url != source and unchanged_file(os.path.join(media_dir, url), data):
+            # Nenhum caractere novo: o subconjunto anterior continua valendo
+            entry["subset"] = url
+            entry["unchanged"] = True
+            replacements[url] = url
+        elif not dry_run:
+            if url != source:
+                # Subconjunto da execução anterior
+                col.media.trash_files([url])
+            # write_data devolve outro nome se já existir um arquivo diferente com esse
+            entry["subset"] = col.media.write_data(os.path.splitext(source)[0] + SUBSET_SUFFIX + ".woff2", data)
+            replacements[url] = entry["subset"]
+        report["fonts"].append(entry)
+
+    if not dry_run:
+        for model in models:
+            original = copy.deepcopy(model)
+            model['css'] = rewrite_font_faces(model['css'], replacements, font_display)
+            if model.get('clzz') and model['clzz'].get("custom_css"):
+                # As configurações guardadas também, para o Manage Clzz não desfazer
+                model['clzz'] = dict(model['clzz'], custom_css=rewrite_font_faces(
+                    model['clzz']["custom_css"], replacements, font_display))
+            card_types.save_if_changed(col, original, model, None)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("collections", nargs="+", help=".anki2 collection files")
+    parser.add_argument("--font-display", default="swap", help="font-display value to add (empty to skip)")
+    parser.add_argument("--dry-run", action="store_true", help="report the subset sizes without writing anything")
+    args = parser.parse_args()
+
+    if subset is None:
+        raise SystemExit("fontTools is required: pip install fonttools brotli")
+    from anki.collection import Collection
+
+    results = {}
+    for path in args.collections:
+        col = Collection(path)
+        try:
+            results[path] = subset_collection(col, args.font_display, args.dry_run)
+        finally:
+            col.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())